@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+api.py – small read-only JSON API for phones and widgets
+Served entirely from the collector's snapshot (read_model.py), never from
+Postgres: every response is built once per snapshot version, gzipped once,
+and answered with 304 when the client's If-None-Match still matches.
+
+    GET /stations                              station list (+ has_gspot)
+    GET /latest                                latest level + 1h trend per station
+    GET /stations/<id>/history?days=7&points=  level history, LTTB to `points`
+    GET /stations/<id>/forecast                future predicted levels
+    GET /gspot                                 current flag + next forecast window per station
+    GET /health
+    GET /metrics                               collector stage metrics (Prometheus text, metrics.py)
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime, UTC
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+from loguru import logger
+
+import metrics
+import read_model
+from downsample import downsample
+from read_model import RANGES
+from river_reference import STATIONS, get_registry
+from rules import get_rules
+
+PORT = int(os.getenv("API_PORT", "8080"))
+MAX_AGE = 60  # seconds clients may reuse a response without asking
+MAX_RESPONSES = 2000  # distinct URLs cached per snapshot version
+
+class NotFound(Exception):
+    pass
+
+def iso(ts):
+    return None if pd.isna(ts) else pd.Timestamp(ts).isoformat()
+
+def finite(obj):
+    """NaN / inf → None throughout a payload; json.dumps would write a bare NaN, which is not JSON."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: finite(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [finite(v) for v in obj]
+    return obj
+
+# === SNAPSHOT FRAMES ===
+class Snapshot:
+    """Frames of one snapshot version, loaded on first use."""
+    def __init__(self, version):
+        self.version = version
+        self._frames = {}
+
+    def __getitem__(self, name):
+        if name not in self._frames:
+            self._frames[name] = read_model.read_snapshot(name, self.version)
+        return self._frames[name]
+
+# === ENDPOINTS ===
+def stations(snap, query):
+    rules = get_rules()
+    return [{"id": s['id'], "river": river, "label": s['label'], "lat": s.get('lat'), "lon": s.get('lon'),
+             "has_gspot": s['id'] in rules}
+            for river, river_stations in STATIONS.items() for s in river_stations]
+
+def latest(snap, query):
+    hist = snap["history_7"]
+    out = []
+    for row in snap["latest"].itertuples():
+        h = hist[hist['station_id'] == row.station_id]
+        hour_ago = h[h['Date'] <= row.timestamp - pd.Timedelta(hours=1)]
+        trend = None if hour_ago.empty else round(float(row.level - hour_ago['Level (metres)'].iloc[-1]), 3)
+        out.append({"station_id": row.station_id, "river": row.river, "label": row.label,
+                    "level": row.level, "timestamp": iso(row.timestamp), "trend_1h": trend})
+    return out
+
+def history(snap, query, station_id):
+    days = int(query.get("days", ["7"])[0])
+    if days not in RANGES:
+        raise ValueError(f"days must be one of {RANGES}")
+    h = snap[f"history_{days}"]
+    h = h[h['station_id'] == station_id]
+    if "points" in query:
+        h = downsample(h, 'Level (metres)', n_out=max(3, int(query["points"][0])))
+    return [{"t": iso(t), "level": lvl, "gspot": g == 'y'}
+            for t, lvl, g in zip(h['Date'], h['Level (metres)'], h['good_level'])]
+
+def forecast(snap, query, station_id):
+    p = snap["predictions_7"]
+    p = p[(p['station_id'] == station_id) & (p['Date'] >= pd.Timestamp(datetime.now(UTC)))]
+    return [{"t": iso(t), "level": lvl} for t, lvl in zip(p['Date'], p['Level (metres)'])]
+
+def gspot(snap, query):
+    windows = snap["gspot_forecast"].set_index('station_id')
+    hist = snap["history_7"]
+    out = []
+    for sid in get_rules():
+        h = hist[hist['station_id'] == sid]
+        w = windows.loc[sid] if sid in windows.index else None
+        out.append({"station_id": sid,
+                    "now": bool(len(h)) and h['good_level'].iloc[-1] == 'y',
+                    "next_start": None if w is None else iso(w['window_start']),
+                    "next_end": None if w is None else iso(w['window_end'])})
+    return out
+
+def route(path, query, snap):
+    parts = [p for p in path.split("/") if p]
+    if parts == ["stations"]:
+        return stations(snap, query)
+    if parts == ["latest"]:
+        return latest(snap, query)
+    if parts == ["gspot"]:
+        return gspot(snap, query)
+    if len(parts) == 3 and parts[0] == "stations" and parts[2] in ("history", "forecast"):
+        if parts[1] not in get_registry().by_id:
+            raise NotFound(path)
+        return (history if parts[2] == "history" else forecast)(snap, query, parts[1])
+    raise NotFound(path)
+
+# === RESPONSE CACHE ===
+# {(path, query): (etag, body, gzipped body)} for the current snapshot version only
+_cache = {"version": None, "snapshot": None, "responses": {}}
+_lock = threading.Lock()
+
+def cached_response(path, raw_query):
+    version = read_model.snapshot_version()
+    if version is None:
+        return None
+    with _lock:
+        if version != _cache["version"]:
+            _cache.update(version=version, snapshot=Snapshot(version), responses={})
+        key = (path, raw_query)
+        if key not in _cache["responses"]:
+            if len(_cache["responses"]) >= MAX_RESPONSES:
+                _cache["responses"].clear()
+            payload = {"version": version, "data": finite(route(path, parse_qs(raw_query), _cache["snapshot"]))}
+            body = json.dumps(payload, separators=(",", ":"), allow_nan=False).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            _cache["responses"][key] = (etag, body, gzip.compress(body, compresslevel=6))
+        return _cache["responses"][key]
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, json.dumps({"snapshot": read_model.snapshot_version()}).encode())
+        if url.path == "/metrics":
+            return self._send(200, metrics.collect().encode(), content_type="text/plain; version=0.0.4")
+        try:
+            cached = cached_response(url.path, url.query)
+        except NotFound:
+            return self._send(404, b'{"error":"not found"}')
+        except ValueError as e:
+            return self._send(400, json.dumps({"error": str(e)}).encode())
+        except Exception:
+            logger.exception(f"{self.path} failed")
+            return self._send(500, b'{"error":"internal error"}')
+        if cached is None:
+            return self._send(503, b'{"error":"no current snapshot"}')
+
+        etag, body, gz = cached
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        self._send(200, gz if use_gzip else body, etag=etag, gzipped=use_gzip)
+
+    def _send(self, status, body, etag=None, gzipped=False, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", f"public, max-age={MAX_AGE}")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if etag:
+            self.send_header("ETag", etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # thousands of polling clients – keep the log for errors
+
+if __name__ == "__main__":
+    logger.info(f"River Dipstick API on :{PORT}")
+    ThreadingHTTPServer(("0.0.0.0", PORT), Handler).serve_forever()
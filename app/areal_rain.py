@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+areal_rain.py – catchment rain from several gauges per level station
+rain_gauges.csv (utility/sync_catalog.py) lists each station's nearest gauges.
+They are weighted by inverse distance squared into a sparse (stations × gauges)
+matrix W, so every station's hourly areal rain is one product W @ G over the
+hourly gauge matrix G. Hours where a gauge has no reading renormalize over the
+gauges that do.
+
+Each collector run pulls new readings once per gauge (gauges shared between
+stations are fetched once) into gauge_readings, then materializes the last
+--hours of areal_rainfall for the predictor.
+
+    python /app/areal_rain.py                 # collector step
+    python /app/areal_rain.py --hours 2160    # rebuild 90 days
+"""
+import argparse
+import csv
+import os
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+from scipy import sparse
+from loguru import logger
+from dotenv import load_dotenv
+
+from ea_api import api_items
+from refresh import notify
+from river_reference import EA_API_BASE
+from shards import is_leader
+from profiling import profiled
+
+load_dotenv()
+DB_PASS = os.getenv("DB_PASSWORD")
+CONN = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
+GAUGES_PATH = Path("/app/data/rain_gauges.csv")
+EA_READINGS = EA_API_BASE + "/id/stations/{}/readings"
+POWER = 2
+MIN_KM = 1.0  # a gauge on top of the station gets a large, not infinite, weight
+DEFAULT_HOURS = 48
+
+def init_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS gauge_readings (
+            gauge_id TEXT NOT NULL,
+            timestamp TIMESTAMPTZ NOT NULL,
+            rainfall_mm REAL,
+            PRIMARY KEY (gauge_id, timestamp)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS areal_rainfall (
+            station_id TEXT NOT NULL,
+            hour TIMESTAMPTZ NOT NULL,
+            rainfall_mm REAL,
+            PRIMARY KEY (station_id, hour)
+        )
+    """)
+
+# === WEIGHTS ===
+_weights = {"mtime": None, "value": None}
+
+def load_weights(path=GAUGES_PATH):
+    """(station_ids, gauge_ids, W) with W a CSR matrix whose rows sum to 1; re-read when the file changes."""
+    mtime = path.stat().st_mtime_ns
+    if mtime != _weights["mtime"]:
+        with open(path, newline="") as f:
+            rows = [(r["station_id"], r["gauge_id"], float(r["distance_km"])) for r in csv.DictReader(f)]
+        station_ids = sorted({s for s, _, _ in rows})
+        gauge_ids = sorted({g for _, g, _ in rows})
+        s_idx = {s: i for i, s in enumerate(station_ids)}
+        g_idx = {g: i for i, g in enumerate(gauge_ids)}
+        w = np.array([max(km, MIN_KM) ** -POWER for _, _, km in rows])
+        W = sparse.csr_matrix((w, ([s_idx[s] for s, _, _ in rows], [g_idx[g] for _, g, _ in rows])),
+                              shape=(len(station_ids), len(gauge_ids)))
+        W = sparse.diags(1 / np.asarray(W.sum(axis=1)).ravel()) @ W
+        _weights.update(mtime=mtime, value=(station_ids, gauge_ids, W.tocsr()))
+    return _weights["value"]
+
+def areal(W, G):
+    """Areal rain (stations × hours) from gauge rain G (gauges × hours, NaN = no reading)."""
+    have = ~np.isnan(G)
+    num = W @ np.where(have, G, 0.0)
+    den = W @ have.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+# === INGEST ===
+def fetch_new_readings(cur, gauge_ids, since, refetch=False):
+    """
+    New readings for every gauge, once per gauge; returns rows inserted.
+    Each gauge resumes from its newest stored reading, or from `since` when
+    refetch is set (a rebuild fills holes in the stored history too).
+    """
+    last = {}
+    if not refetch:
+        cur.execute("""
+            SELECT gauge_id, MAX(timestamp) FROM gauge_readings
+            WHERE gauge_id = ANY(%s) GROUP BY gauge_id
+        """, (gauge_ids,))
+        last = dict(cur.fetchall())
+    rows = []
+    for gid in gauge_ids:
+        start = max(last.get(gid) or since, since)
+        items = api_items(EA_READINGS.format(gid), params={"parameter": "rainfall", "_sorted": "",
+                                                          "since": start.strftime('%Y-%m-%dT%H:%M:%SZ')})
+        if items is None:
+            # Inserting part would move MAX(timestamp) past the readings that are missing
+            logger.warning(f"Gauge {gid}: fetch failed part way, skipped until the next run")
+            continue
+        rows += [(gid, item['dateTime'], item['value']) for item in items if 'value' in item]
+    if not rows:
+        return 0
+    inserted = execute_values(cur, """
+        INSERT INTO gauge_readings (gauge_id, timestamp, rainfall_mm) VALUES %s
+        ON CONFLICT (gauge_id, timestamp) DO NOTHING
+        RETURNING 1
+    """, rows, page_size=1000, fetch=True)
+    return len(inserted)
+
+def hourly_gauges(cur, gauge_ids, since, until):
+    """Hourly gauge totals as a (gauges × hours) array, NaN where a gauge reported nothing."""
+    cur.execute("""
+        SELECT gauge_id, date_trunc('hour', timestamp) AS hour, SUM(rainfall_mm)
+        FROM gauge_readings
+        WHERE gauge_id = ANY(%s) AND timestamp >= %s AND timestamp < %s
+        GROUP BY 1, 2
+    """, (gauge_ids, since, until))
+    df = pd.DataFrame(cur.fetchall(), columns=["gauge_id", "hour", "mm"])
+    hours = pd.date_range(since, until, freq="h", inclusive="left")
+    if df.empty:
+        return hours, np.full((len(gauge_ids), len(hours)), np.nan)
+    df["hour"] = pd.to_datetime(df["hour"], utc=True)
+    G = df.pivot(index="gauge_id", columns="hour", values="mm").reindex(index=gauge_ids, columns=hours)
+    return hours, G.to_numpy(dtype=float)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest gauge rain and materialize hourly areal rainfall")
+    parser.add_argument("--hours", type=int, help=f"rebuild this many hours, refetching gauge history "
+                                                  f"(default: the last {DEFAULT_HOURS}, new readings only)")
+    args = parser.parse_args()
+    if not is_leader(CONN, "areal_rain"):
+        return
+    if not GAUGES_PATH.exists():
+        logger.warning(f"No {GAUGES_PATH} — run utility/sync_catalog.py first")
+        return
+
+    station_ids, gauge_ids, W = load_weights()
+    until = datetime.now(UTC).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    since = until - timedelta(hours=args.hours or DEFAULT_HOURS)
+
+    conn = psycopg2.connect(CONN)
+    cur = conn.cursor()
+    init_tables(cur)
+    new = fetch_new_readings(cur, gauge_ids, since, refetch=args.hours is not None)
+    conn.commit()
+    logger.info(f"{new} new readings from {len(gauge_ids)} gauges")
+
+    hours, G = hourly_gauges(cur, gauge_ids, since, until)
+    A = areal(W, G)
+    s, h = np.nonzero(~np.isnan(A))
+    execute_values(cur, """
+        INSERT INTO areal_rainfall (station_id, hour, rainfall_mm) VALUES %s
+        ON CONFLICT (station_id, hour) DO UPDATE SET rainfall_mm = EXCLUDED.rainfall_mm
+    """, [(station_ids[i], hours[j].to_pydatetime(), float(A[i, j])) for i, j in zip(s, h)], page_size=5000)
+    conn.commit()
+    conn.close()
+    if new:
+        notify(CONN, "areal_rain")
+    logger.success(f"Areal rain for {len(station_ids)} stations × {len(hours)} hours")
+
+if __name__ == "__main__":
+    with profiled("areal_rain"):
+        main()
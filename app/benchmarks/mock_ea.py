@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+mock_ea.py – local stand-in for the EA flood-monitoring API
+Serves the endpoints the collector, areal_rain.py, sync_catalog.py and the
+backfills use, so they can be load-tested offline at any station count:
+
+    GET /flood-monitoring/id/stations?parameter=level|rainfall&_limit=   catalog
+    GET /flood-monitoring/id/stations/<id>.json                          one station
+    GET /flood-monitoring/id/stations/<id>/readings                      latest / since /
+        ?parameter=&latest&since=&_sorted&_limit=&_offset=               newest-first / paging
+    GET /flood-monitoring/archive/readings-full-<YYYY-MM-DD>.csv         daily archive
+
+Any station id works: its rain and levels are generated on first request by
+synth.py (seeded from the id, so every run serves the same history) up to the
+current wall-clock time, and new 15-minute readings appear as time passes.
+Recorded EA archive CSVs given with --archive replace the synthetic series of
+the stations they contain.
+
+HEAD is answered like GET without the body.
+
+Faults for retry / gap-repair testing: --latency-ms (exponential, mean),
+--error-rate (fraction of requests answered 500/503), and --outage START:SECONDS
+(repeatable; every request 503s in that window, counted from server start).
+
+    python /app/benchmarks/mock_ea.py --port 8070 --stations 500 --latency-ms 80 --error-rate 0.02
+    EA_API_BASE=http://mock-ea:8070/flood-monitoring python /app/get_readings.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import synth
+
+PREFIX = "/flood-monitoring"
+DEFAULT_LIMIT = 500
+HISTORY_DAYS = 30
+ROOT = "http://environment.data.gov.uk/flood-monitoring"
+CATALOG_BOX = (53.8, 55.0, -3.4, -2.2)  # lat / lon range new stations are placed in
+
+class NotFound(Exception):
+    pass
+
+class Store:
+    """Per-station (stamps, values) series, EA-format stamps sorted ascending."""
+
+    def __init__(self, history_days, catalog_size, archive_stations):
+        self.history_days = history_days
+        self.catalog_size = catalog_size
+        self.archive_stations = archive_stations
+        self.started = pd.Timestamp.now(tz="UTC")
+        self._series = {}
+        self._archives = {}
+        self._lock = threading.Lock()
+
+    def _generate(self, station_id):
+        # Through tomorrow, so readings keep arriving while the server runs; every
+        # 15-minute rain reading, dry ones included, like a real gauge
+        end = self.started + pd.Timedelta(days=1)
+        levels, rain = synth.generate([station_id], self.history_days / 365 + 1 / 365,
+                                      seed=zlib.crc32(station_id.encode()), end=end, dry=True)
+        return {
+            "level": (levels["timestamp"].to_numpy(), levels["level"].to_numpy()),
+            "rainfall": (rain["timestamp"].to_numpy(), rain["rainfall_mm"].to_numpy()),
+        }
+
+    def series(self, station_id, parameter):
+        with self._lock:
+            if station_id not in self._series:
+                self._series[station_id] = self._generate(station_id)
+            return self._series[station_id].get(parameter, (np.array([], dtype=object), np.array([])))
+
+    def load_archive(self, path):
+        """Serve recorded readings from an EA readings-full CSV instead of synthetic ones."""
+        df = pd.read_csv(path, usecols=["dateTime", "measure", "stationReference", "value"])
+        df["value"] = pd.to_numeric(df["value"], errors="coerce")
+        df["parameter"] = np.where(df["measure"].str.contains("-rainfall-"), "rainfall", "level")
+        df = df.dropna(subset=["value"]).sort_values("dateTime")
+        for (sid, parameter), g in df.groupby(["stationReference", "parameter"]):
+            entry = self._series.setdefault(str(sid), {})
+            stamps, values = entry.get(parameter, (np.array([], dtype=object), np.array([])))
+            merged = pd.Series(np.concatenate([values, g["value"].to_numpy()]),
+                               index=np.concatenate([stamps, g["dateTime"].to_numpy()]))
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            entry[parameter] = (merged.index.to_numpy(), merged.to_numpy())
+        logger.info(f"Loaded {len(df):,} recorded readings from {path}")
+
+    def catalog(self, parameter):
+        """The first catalog_size synthetic stations of a kind, placed deterministically."""
+        rng = np.random.default_rng(0 if parameter == "level" else 1)
+        lat = rng.uniform(*CATALOG_BOX[:2], self.catalog_size)
+        lon = rng.uniform(*CATALOG_BOX[2:], self.catalog_size)
+        prefix = "M" if parameter == "level" else "G"
+        return [{"notation": f"{prefix}{i:05d}", "label": f"Mock {prefix}{i:05d}", "riverName": f"River Mock {i % 20}",
+                 "lat": round(lat[i], 5), "long": round(lon[i], 5)} for i in range(self.catalog_size)]
+
+    def archive(self, date):
+        """readings-full CSV for one day across the catalog stations (cached per day)."""
+        with self._lock:
+            cached = self._archives.get(date)
+        if cached is None:
+            day = pd.Timestamp(date, tz="UTC")
+            ids = [s["notation"] for s in self.catalog("level")]
+            levels = pd.concat([pd.DataFrame({"station_id": sid, "timestamp": st, "level": v})
+                                for sid in ids for st, v in [self.series(sid, "level")]])
+            rain = pd.concat([pd.DataFrame({"level_station_id": sid, "rainfall_station_id": sid,
+                                            "timestamp": st, "rainfall_mm": v})
+                              for sid in ids for st, v in [self.series(sid, "rainfall")]])
+            cached = synth.archive_csv(levels, rain, day, self.archive_stations).encode()
+            with self._lock:
+                self._archives = {date: cached}  # one day at a time keeps memory flat
+        return cached
+
+def stamp(value):
+    """EA-format UTC stamp; naive values are taken as UTC. Raises ValueError if unparseable."""
+    ts = pd.Timestamp(value)
+    return (ts.tz_convert("UTC") if ts.tzinfo else ts).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def readings(store, station_id, query):
+    parameter = query.get("parameter", "level")
+    stamps, values = store.series(station_id, parameter)
+    now = stamp(pd.Timestamp.now(tz="UTC"))
+    hi = np.searchsorted(stamps, now, side="right")  # nothing from the future
+    if "latest" in query:
+        lo = max(hi - 1, 0)
+    elif "since" in query:
+        lo = np.searchsorted(stamps, stamp(query["since"]), side="left")
+    else:
+        lo = max(hi - DEFAULT_LIMIT, 0)
+    idx = np.arange(lo, hi)
+    if "_sorted" in query:
+        idx = idx[::-1]  # EA sorts newest first
+    offset = int(query.get("_offset", 0))
+    idx = idx[offset:offset + int(query.get("_limit", DEFAULT_LIMIT))]
+    measure = f"{ROOT}/id/measures/{station_id}-{parameter}-{'t' if parameter == 'rainfall' else 'i'}-15_min"
+    return {"items": [{"@id": f"{ROOT}/data/readings/{station_id}/{stamps[i]}", "dateTime": stamps[i],
+                       "measure": measure, "value": float(values[i])} for i in idx]}
+
+def route(store, path, query):
+    """(content type, body bytes) for a request path, or raises NotFound / ValueError."""
+    path = path.removeprefix(PREFIX)
+    if path == "/id/stations":
+        items = store.catalog(query.get("parameter", "level"))[:int(query.get("_limit", DEFAULT_LIMIT))]
+        return "application/json", json.dumps({"items": items}).encode()
+    if m := re.fullmatch(r"/id/stations/([^/]+)/readings", path):
+        return "application/json", json.dumps(readings(store, m[1], query)).encode()
+    if m := re.fullmatch(r"/id/stations/([^/]+?)(?:\.json)?", path):
+        rng = np.random.default_rng(zlib.crc32(m[1].encode()))
+        item = {"notation": m[1], "label": f"Mock {m[1]}",
+                "lat": round(rng.uniform(*CATALOG_BOX[:2]), 5), "long": round(rng.uniform(*CATALOG_BOX[2:]), 5)}
+        return "application/json", json.dumps({"items": item}).encode()
+    if m := re.fullmatch(r"/archive/readings-full-(\d{4}-\d{2}-\d{2})\.csv", path):
+        if pd.Timestamp(m[1], tz="UTC") >= store.started.normalize():
+            raise NotFound()  # EA publishes a day's archive the morning after
+        return "text/csv", store.archive(m[1])
+    raise NotFound()
+
+class Handler(BaseHTTPRequestHandler):
+    store = None
+    faults = None
+
+    def do_GET(self):
+        faults = self.faults
+        if faults.latency:
+            time.sleep(random.expovariate(1 / faults.latency))
+        elapsed = time.time() - faults.started
+        if any(start <= elapsed < start + length for start, length in faults.outages):
+            return self._send(503, "text/plain", b"Service Unavailable (mock outage)")
+        if random.random() < faults.error_rate:
+            return self._send(random.choice([500, 503]), "text/plain", b"Injected error")
+
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        try:
+            content_type, body = route(self.store, url.path, query)
+        except NotFound:
+            return self._send(404, "application/json", b'{"error":"not found"}')
+        except ValueError as e:
+            return self._send(400, "application/json", json.dumps({"error": str(e)}).encode())
+        self._send(200, content_type, body)
+
+    # Same status and headers, no body (backfill_rain.py checks each archive day this way)
+    do_HEAD = do_GET
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass  # a load test is thousands of requests – errors are what matter
+
+class Faults:
+    def __init__(self, latency_ms, error_rate, outages):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.outages = outages
+        self.started = time.time()
+
+def outage(value):
+    start, length = value.split(":")
+    return float(start), float(length)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local EA flood-monitoring API stand-in")
+    parser.add_argument("--port", type=int, default=8070)
+    parser.add_argument("--stations", type=int, default=500, help="stations in the catalog and daily archives")
+    parser.add_argument("--history-days", type=int, default=HISTORY_DAYS, help="history generated per station")
+    parser.add_argument("--archive-stations", type=int, default=0, help="extra unrelated stations per archive day")
+    parser.add_argument("--archive", nargs="*", default=[], help="recorded readings-full CSVs to serve instead")
+    parser.add_argument("--latency-ms", type=float, default=0, help="mean added latency (exponential)")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered 500/503")
+    parser.add_argument("--outage", type=outage, action="append", default=[], metavar="START:SECONDS",
+                        help="503 everything from START for SECONDS after startup (repeatable)")
+    args = parser.parse_args()
+
+    Handler.store = Store(args.history_days, args.stations, args.archive_stations)
+    for path in args.archive:
+        Handler.store.load_archive(path)
+    Handler.faults = Faults(args.latency_ms, args.error_rate, args.outage)
+    logger.info(f"Mock EA API on :{args.port}{PREFIX} – {args.stations} catalog stations, "
+                f"latency {args.latency_ms}ms, error rate {args.error_rate}, outages {args.outage}")
+    ThreadingHTTPServer(("0.0.0.0", args.port), Handler).serve_forever()
+
+if __name__ == "__main__":
+    main()
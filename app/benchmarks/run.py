@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+run.py – benchmark every pipeline stage against synthetic data
+Generates --years of 15-minute data for --stations (synth.py), loads it into a
+scratch Postgres database and times the real code paths:
+
+    ingest        get_readings.insert_reading, new rows and duplicates; COPY load
+    gaps          get_readings.has_gaps per station
+    predictor     features.load_hourly / build_features / recursive_forecast
+    gspot         update_gspot.update_station over the last 2 days
+    archive       one day's readings-full CSV through the backfills' own parsers,
+                  backfill_rain.parse_archive (pandas) and
+                  backfill_levels_csv.parse_archive (csv.DictReader)
+    dashboard     read_model queries + for_chart at every range in RANGES
+
+The first stations take the ids of stations that have a model / G SPOT rule
+(levels are generated through each rule's band), so the predictor and gspot
+stages run the production models and rules unchanged. archive needs no
+database and runs even when Postgres is unreachable.
+
+Tables in the scratch database are dropped and recreated; the live database is
+refused. Results (median / min / max seconds per benchmark plus run parameters
+and git revision) go to a JSON file so runs can be compared over time.
+
+    python /app/benchmarks/run.py                                  # 20 stations, 1 year
+    python /app/benchmarks/run.py --stations 200 --years 3 --only ingest gaps dashboard
+    python /app/benchmarks/run.py --only archive --repeat 5        # no database needed
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from loguru import logger
+from dotenv import load_dotenv
+
+# Add /app to path for shared imports
+sys.path.append("/app")
+sys.path.append("/app/utility")  # the backfills, for their archive parsers
+import synth
+
+load_dotenv()
+DB_PASS = os.getenv("DB_PASSWORD")
+BENCH_DSN = os.getenv("BENCH_DSN", f"postgresql://river_user:{DB_PASS}@db/river_bench")
+LIVE_DB = "river_levels_db"
+MODEL_DIR = "/app/models"
+RESULTS_DIR = Path("/app/data/benchmarks")
+STAGES = ["ingest", "gaps", "predictor", "gspot", "archive", "dashboard"]
+RIVER_SIZE = 6  # stations per dashboard query, about one river
+
+SCHEMA = """
+    DROP TABLE IF EXISTS readings, rainfall_readings, predictions;
+    CREATE TABLE readings (
+        id SERIAL PRIMARY KEY,
+        station_id TEXT NOT NULL,
+        river TEXT NOT NULL,
+        label TEXT NOT NULL,
+        level REAL,
+        timestamp TEXT NOT NULL,
+        good_level TEXT DEFAULT 'n',
+        UNIQUE(station_id, timestamp)
+    );
+    CREATE TABLE rainfall_readings (
+        id SERIAL PRIMARY KEY,
+        level_station_id TEXT NOT NULL,
+        rainfall_station_id TEXT NOT NULL,
+        rainfall_mm REAL,
+        timestamp TEXT NOT NULL,
+        UNIQUE(level_station_id, timestamp)
+    );
+    CREATE TABLE predictions (
+        station_id TEXT NOT NULL,
+        predicted_level REAL,
+        predicted_for TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        UNIQUE(station_id, predicted_for)
+    );
+"""
+
+results = {}
+
+def bench(name, fn, repeat, setup=None, items=None):
+    """Time fn() `repeat` times (setup() runs untimed before each) and record the stats."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    results[name] = {
+        "repeat": repeat,
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "max_s": round(max(times), 6),
+    }
+    if items:
+        results[name]["items"] = items
+        results[name]["per_item_ms"] = round(statistics.median(times) / items * 1000, 4)
+    logger.info(f"{name:<34} median {statistics.median(times) * 1000:10.1f} ms"
+                + (f"  ({results[name]['per_item_ms']} ms/item)" if items else ""))
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def template_stations():
+    """Ids that have a model or a G SPOT rule, with the rule's band when there is one."""
+    from rules import get_rules
+    rules = get_rules()
+    modelled = {p.name.split("_")[0] for p in Path(MODEL_DIR).glob("*_hgboost.*")}
+    bands = {sid: (r.falling_end, r.falling_start) for sid, r in rules.items()}
+    return sorted(modelled | set(bands)), bands
+
+def connect(dsn):
+    """Scratch database connection, creating the database on first use; None if Postgres is unreachable."""
+    params = psycopg2.extensions.parse_dsn(dsn)
+    if params.get("dbname") == LIVE_DB:
+        sys.exit(f"Refusing to benchmark against the live database {LIVE_DB} – tables are dropped")
+    try:
+        return psycopg2.connect(dsn)
+    except psycopg2.OperationalError as e:
+        if "does not exist" not in str(e):
+            logger.warning(f"Postgres unreachable ({str(e).strip()}) – database stages skipped")
+            return None
+    admin = psycopg2.connect(psycopg2.extensions.make_dsn(dsn, dbname="postgres"))
+    admin.autocommit = True
+    admin.cursor().execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(params["dbname"])))
+    admin.close()
+    return psycopg2.connect(dsn)
+
+def copy_frame(cur, table, df):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH CSV", buf)
+
+def load(conn, levels, rainfall, predictions):
+    readings = levels.assign(river="Bench", label="Synthetic " + levels["station_id"])
+    readings = readings[["station_id", "river", "label", "level", "timestamp"]]
+
+    def reset():
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA)
+        conn.commit()
+
+    def copy_all():
+        with conn.cursor() as cur:
+            copy_frame(cur, "readings", readings)
+            copy_frame(cur, "rainfall_readings", rainfall)
+            copy_frame(cur, "predictions", predictions)
+        conn.commit()
+
+    bench("load_copy", copy_all, 1, setup=reset, items=len(readings) + len(rainfall) + len(predictions))
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+    conn.commit()
+
+# === STAGES ===
+def bench_ingest(conn, dsn, levels, repeat):
+    import get_readings
+    get_readings.CONNECTION_STRING = dsn
+    # The newest reading of every station, as the 15-minute collector sees them
+    latest = levels.groupby("station_id").tail(1)
+    rows = list(latest[["station_id", "level", "timestamp"]].itertuples(index=False))
+
+    def delete_latest():
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM readings WHERE (station_id, timestamp) IN (SELECT * FROM unnest(%s::text[], %s::text[]))",
+                        ([r.station_id for r in rows], [r.timestamp for r in rows]))
+        conn.commit()
+
+    def insert_all():
+        for r in rows:
+            get_readings.insert_reading(r.station_id, "Bench", "Synthetic", r.level, r.timestamp)
+
+    bench("ingest_insert_new", insert_all, repeat, setup=delete_latest, items=len(rows))
+    bench("ingest_insert_duplicate", insert_all, repeat, items=len(rows))
+
+def bench_gaps(dsn, station_ids, repeat):
+    import get_readings
+    get_readings.CONNECTION_STRING = dsn
+    bench("gaps_has_gaps", lambda: [get_readings.has_gaps(sid) for sid in station_ids], repeat, items=len(station_ids))
+
+def bench_predictor(dsn, station_ids, repeat):
+    from sqlalchemy import create_engine
+    from compact_model import load_model
+    from features import load_hourly, build_features, recursive_forecast
+    engine = create_engine(dsn)
+    models = {sid: m for sid in station_ids if (m := load_model(MODEL_DIR, sid)) is not None}
+    if not models:
+        logger.warning("No models found – predictor stage skipped")
+        return
+    since = datetime.now(UTC) - timedelta(days=3650)
+    frames, features = {}, {}
+
+    def load_all():
+        for sid in models:
+            frames[sid] = load_hourly(engine, sid, since)
+
+    def build_all():
+        for sid, df in frames.items():
+            features[sid] = build_features(df).drop(columns=['level']).iloc[-1:]
+
+    future_start = pd.Timestamp.now().floor("h") + pd.Timedelta(hours=1)
+    bench("predictor_load_hourly", load_all, repeat, items=len(models))
+    bench("predictor_build_features", build_all, repeat, items=len(models))
+    bench("predictor_forecast_24h", lambda: [recursive_forecast(models[sid], X, future_start) for sid, X in features.items()],
+          repeat, items=len(models))
+    engine.dispose()
+
+def bench_gspot(conn, station_ids, repeat):
+    from rules import rule_for
+    from update_gspot import update_station
+    ruled = [sid for sid in station_ids if rule_for(sid)]
+    if not ruled:
+        logger.warning("No G SPOT rules for the synthetic stations – gspot stage skipped")
+        return
+    since = (datetime.now(UTC) - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def reset_flags():
+        with conn.cursor() as cur:
+            cur.execute("UPDATE readings SET good_level = 'n' WHERE good_level = 'y' AND timestamp >= %s", (since,))
+        conn.commit()
+
+    bench("gspot_update_station", lambda: [update_station(sid, conn) for sid in ruled], repeat,
+          setup=reset_flags, items=len(ruled))
+
+def bench_archive(levels, rainfall, station_ids, other_stations, repeat):
+    day = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=1)
+    text = synth.archive_csv(levels, rainfall, day, other_stations)
+    ours = set(station_ids)
+    rainfall_ids = set(rainfall["rainfall_station_id"])
+    import backfill_rain
+    import backfill_levels_csv
+
+    rows = text.count("\n") - 1
+    logger.info(f"Archive day: {rows:,} rows, {len(text) / 1e6:.1f} MB")
+    bench("archive_parse_pandas", lambda: backfill_rain.parse_archive(text, rainfall_ids), repeat, items=rows)
+    bench("archive_parse_dictreader", lambda: sum(1 for _ in backfill_levels_csv.parse_archive(io.StringIO(text), ours)),
+          repeat, items=rows)
+
+def bench_dashboard(conn, station_ids, repeat):
+    import read_model
+    ids = station_ids[:RIVER_SIZE]
+    bench("dashboard_latest_readings", lambda: read_model.latest_readings(conn), repeat)
+    for days in read_model.RANGES:
+        for name in ("history", "predictions", "rainfall"):
+            query = getattr(read_model, name)
+            frame = {}
+
+            def run_query():
+                frame["df"] = query(conn, ids, days)
+                conn.rollback()
+
+            bench(f"dashboard_{name}_{days}d", run_query, repeat, items=len(ids))
+            bench(f"dashboard_{name}_{days}d_for_chart", lambda: read_model.for_chart(frame["df"]), repeat,
+                  items=len(frame["df"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data")
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--archive-stations", type=int, default=3000, help="other stations in the archive CSV")
+    parser.add_argument("--only", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--dsn", default=BENCH_DSN, help="scratch Postgres database (env BENCH_DSN)")
+    parser.add_argument("--out", help="results JSON (default /app/data/benchmarks/bench-<time>.json)")
+    args = parser.parse_args()
+
+    started = datetime.now(UTC)
+    templates, bands = template_stations()
+    station_ids = (templates + [f"B{i:05d}" for i in range(args.stations)])[:args.stations]
+    t0 = time.perf_counter()
+    levels, rainfall = synth.generate(station_ids, args.years, args.seed, bands)
+    predictions = synth.hourly_predictions(levels, args.seed)
+    logger.info(f"Generated {len(levels):,} levels, {len(rainfall):,} rain readings and {len(predictions):,} "
+                f"predictions for {len(station_ids)} stations in {time.perf_counter() - t0:.1f}s")
+
+    conn = None
+    if set(args.only) - {"archive"}:
+        conn = connect(args.dsn)
+    if conn is not None:
+        load(conn, levels, rainfall, predictions)
+        if "ingest" in args.only:
+            bench_ingest(conn, args.dsn, levels, args.repeat)
+        if "gaps" in args.only:
+            bench_gaps(args.dsn, station_ids, args.repeat)
+        if "predictor" in args.only:
+            bench_predictor(args.dsn, station_ids, args.repeat)
+        if "gspot" in args.only:
+            bench_gspot(conn, station_ids, args.repeat)
+        if "dashboard" in args.only:
+            bench_dashboard(conn, station_ids, args.repeat)
+        conn.close()
+    if "archive" in args.only:
+        bench_archive(levels, rainfall, station_ids, args.archive_stations, args.repeat)
+
+    report = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("dsn", "out")},
+        "rows": {"readings": len(levels), "rainfall_readings": len(rainfall), "predictions": len(predictions)},
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"bench-{started:%Y%m%dT%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    logger.success(f"{len(results)} benchmarks → {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+synth.py – synthetic EA-style data for the benchmarks
+Years of 15-minute rain and river levels per station. Storms arrive as a
+seasonal Poisson process (wetter winters) with gamma-distributed durations and
+exponential intensities; each station's level is its rain pushed through a
+unit hydrograph (fast rise, exponential recession) and a rating-curve-like
+square root, on top of baseflow, with sensor noise and ~0.5% dropped readings
+so gap detection has something to find.
+
+Frames use the database's shapes: EA-format TEXT timestamps
+("2025-01-01T00:15:00Z") for readings / rainfall_readings, real datetimes for
+predictions. Everything is reproducible from the seed.
+
+    python /app/benchmarks/synth.py --stations 5 --years 1   # summary only
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+
+STEP = pd.Timedelta(minutes=15)
+STEPS_PER_HOUR = 4
+STORMS_PER_DAY = 0.25           # mean; ×1.5 in midwinter, ×0.5 in midsummer
+MEAN_STORM_HOURS = 6
+MEAN_INTENSITY_MM_H = 1.5
+DROPOUT = 0.005
+ARCHIVE_COLUMNS = ["dateTime", "date", "measure", "station", "label", "stationReference",
+                   "parameter", "qualifier", "datumType", "period", "unitName", "valueType", "value"]
+
+def timeline(years, end=None):
+    """15-minute UTC index covering `years` up to the last quarter hour before `end`."""
+    end = (end or pd.Timestamp.now(tz="UTC")).floor("15min")
+    return pd.date_range(end=end, periods=int(years * 365 * 24 * STEPS_PER_HOUR), freq=STEP)
+
+def storm_rain(times, rng):
+    """15-minute rain totals (mm) for one gauge."""
+    n = len(times)
+    days = n / (24 * STEPS_PER_HOUR)
+    n_storms = rng.poisson(STORMS_PER_DAY * days)
+    # Thin a uniform arrival process by season: peak in early January
+    start = rng.integers(0, n, size=int(n_storms * 1.5))
+    doy = times[start].dayofyear.to_numpy()
+    season = 1 + 0.5 * np.cos(2 * np.pi * (doy - 5) / 365.25)
+    start = start[rng.random(len(start)) < season / 1.5]
+
+    duration = np.maximum(1, rng.gamma(2, MEAN_STORM_HOURS / 2, size=len(start)) * STEPS_PER_HOUR).astype(int)
+    intensity = rng.exponential(MEAN_INTENSITY_MM_H / STEPS_PER_HOUR, size=len(start))
+    idx = np.repeat(start, duration) + np.concatenate([np.arange(d) for d in duration]) if len(start) else np.array([], int)
+    rain = np.zeros(n)
+    np.add.at(rain, idx[idx < n], np.repeat(intensity, duration)[idx < n])
+    # EA gauges tip in 0.2 mm buckets
+    return np.round(rain / 0.2) * 0.2
+
+def unit_hydrograph(peak_hours, recession_hours, length_days=10):
+    t = np.arange(length_days * 24 * STEPS_PER_HOUR) / STEPS_PER_HOUR
+    k = np.where(t < peak_hours, t / peak_hours, np.exp(-(t - peak_hours) / recession_hours))
+    return k / k.sum()
+
+def river_level(rain, rng, base, spate):
+    """Level series (m) responding to `rain`: `base` when dry, about `spate` in the wettest 2% of steps."""
+    uh = unit_hydrograph(rng.uniform(3, 9), rng.uniform(18, 48))
+    stage = np.sqrt(fftconvolve(rain, uh)[:len(rain)].clip(min=0))
+    level = base + (spate - base) * stage / max(np.quantile(stage, 0.98), 1e-9)
+    return np.round(level + rng.normal(0, 0.002, size=len(level)), 3)
+
+def generate(station_ids, years=1, seed=0, bands=None, end=None, dry=False):
+    """
+    (levels, rainfall) frames for station_ids.
+    bands: optional {station_id: (falling_end, falling_start)} so levels pass
+    through each station's G SPOT band instead of an arbitrary range.
+    dry: keep the 0 mm readings too, as a live gauge reports every 15 minutes
+    (by default only wet steps are kept, which is all the tables need).
+    """
+    rng = np.random.default_rng(seed)
+    times = timeline(years, end)
+    stamps = times.strftime("%Y-%m-%dT%H:%M:%SZ").to_numpy()
+    bands = bands or {}
+    levels, rainfall = [], []
+    for sid in station_ids:
+        rain = storm_rain(times, rng)
+        low, high = bands.get(sid, (rng.uniform(0.2, 0.6), None))
+        level = river_level(rain, rng, base=low * 0.6, spate=(high or low * 2) * 1.3)
+
+        kept = rng.random(len(times)) >= DROPOUT
+        levels.append(pd.DataFrame({"station_id": sid, "timestamp": stamps[kept], "level": level[kept]}))
+        wet = np.ones(len(rain), bool) if dry else rain > 0
+        rainfall.append(pd.DataFrame({"level_station_id": sid, "rainfall_station_id": f"R{sid}",
+                                      "rainfall_mm": rain[wet], "timestamp": stamps[wet]}))
+    return pd.concat(levels, ignore_index=True), pd.concat(rainfall, ignore_index=True)
+
+def hourly_predictions(levels, seed=0):
+    """A 'past prediction' per station and hour: the hourly mean level plus forecast-sized error."""
+    rng = np.random.default_rng(seed)
+    df = levels.assign(predicted_for=pd.to_datetime(levels["timestamp"]).dt.floor("h").dt.tz_localize(None))
+    df = df.groupby(["station_id", "predicted_for"], as_index=False)["level"].mean()
+    df["predicted_level"] = (df["level"] + rng.normal(0, 0.02, size=len(df))).round(6)
+    return df[["station_id", "predicted_level", "predicted_for"]]
+
+def archive_csv(levels, rainfall, day, other_stations=3000, seed=0):
+    """One day of EA readings-full-{date}.csv text: our stations plus `other_stations` we skip."""
+    rng = np.random.default_rng(seed)
+    prefix = day.strftime("%Y-%m-%d")
+    lv = levels[levels["timestamp"].str.startswith(prefix)]
+    rf = rainfall[rainfall["timestamp"].str.startswith(prefix)]
+    day_stamps = pd.date_range(day, periods=96, freq=STEP).strftime("%Y-%m-%dT%H:%M:%SZ").to_numpy()
+    others = np.char.add("X", np.arange(other_stations).astype(str))
+    noise = pd.DataFrame({"stationReference": np.repeat(others, 96),
+                          "dateTime": np.tile(day_stamps, other_stations),
+                          "value": rng.uniform(0, 3, other_stations * 96).round(3),
+                          "parameter": "level"})
+    frames = [
+        lv.rename(columns={"station_id": "stationReference", "timestamp": "dateTime", "level": "value"}).assign(parameter="level"),
+        rf.rename(columns={"rainfall_station_id": "stationReference", "timestamp": "dateTime", "rainfall_mm": "value"})
+          .drop(columns="level_station_id").assign(parameter="rainfall"),
+        noise,
+    ]
+    df = pd.concat(frames, ignore_index=True).sort_values(["dateTime", "stationReference"], kind="stable")
+    ref = df["stationReference"]
+    df["measure"] = ("http://environment.data.gov.uk/flood-monitoring/id/measures/" + ref + "-"
+                     + df["parameter"] + np.where(df["parameter"] == "level", "-i-15_min-m", "-t-15_min-mm"))
+    df["station"] = "http://environment.data.gov.uk/flood-monitoring/id/stations/" + ref
+    df["label"] = "Synthetic " + ref
+    df["date"] = prefix
+    df["qualifier"] = np.where(df["parameter"] == "level", "Stage", "Tipping Bucket Raingauge")
+    df["datumType"] = ""
+    df["period"] = 900
+    df["unitName"] = np.where(df["parameter"] == "level", "m", "mm")
+    df["valueType"] = np.where(df["parameter"] == "level", "instantaneous", "total")
+    return df[ARCHIVE_COLUMNS].to_csv(index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic levels / rainfall and print a summary")
+    parser.add_argument("--stations", type=int, default=5)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    levels, rainfall = generate([f"S{i:04d}" for i in range(args.stations)], args.years, args.seed)
+    print(f"{len(levels):,} level readings, {len(rainfall):,} rainfall readings")
+    print(levels.groupby("station_id")["level"].describe().round(3))
+    print(rainfall.groupby("level_station_id")["rainfall_mm"].sum().round(1).rename("total rain (mm)"))
+
+if __name__ == "__main__":
+    main()
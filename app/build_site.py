@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+build_site.py – static River Dipstick pages for spate days
+Renders one HTML page per river (station table + Vega-Lite chart specs built
+by charts.py) from the snapshot publish_snapshot.py just wrote, so any static
+file server can carry peak traffic instead of Streamlit sessions.
+Each page is written to a temp file and swapped in with os.replace.
+
+    python /app/build_site.py                 # 7 days, predictions + G SPOT
+    python /app/build_site.py --days 30 --rain
+"""
+import argparse
+import html
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+import read_model
+from charts import station_chart, gspot_banner, legend_html
+from profiling import profiled
+from river_reference import get_registry
+from rules import get_rules
+
+SITE_DIR = Path("/app/data/site")
+LOGO = Path("/app/static/logo.png")
+RIVERS = ["Eden", "Ribble", "Lune", "Hodder"]
+
+PAGE = """<!doctype html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta http-equiv="refresh" content="300">
+<title>River Dipstick – {river}</title>
+{icon}<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+<style>
+body {{ background:#0e1117; color:#fafafa; font-family:sans-serif; margin:0 1rem; }}
+nav a {{ color:#fafafa; margin-right:16px; text-decoration:none; font-size:1rem; }}
+nav a.active {{ color:#b44cec; border-bottom:2px solid #b44cec; font-size:2rem; }}
+table {{ border-collapse:collapse; width:100%; font-size:0.9rem; }}
+th, td {{ text-align:left; padding:4px 8px; border-bottom:1px solid #333; }}
+h3 {{ font-size:1.1rem; margin:1.5rem 0 0.2rem; }}
+.chart {{ width:100%; }}
+footer {{ color:#888; font-size:0.8rem; margin:2rem 0; }}
+.site-title {{ color:#b44cec; display:flex; align-items:center; gap:10px; }}
+.site-title img {{ height:2rem; }}
+</style>
+</head>
+<body>
+<h2 class="site-title">{logo}River Dipstick</h2>
+<nav>{nav}</nav>
+{table}
+{stations}
+<footer>Snapshot {version} · {days} days · updated every 15 minutes</footer>
+<script>
+for (const spec of document.querySelectorAll("script.spec")) {{
+  vegaEmbed(spec.nextElementSibling, JSON.parse(spec.textContent), {{actions: false}});
+}}
+</script>
+</body>
+</html>
+"""
+
+def page_name(river):
+    return f"{river.lower()}.html"
+
+def river_page(river, snap, version, days, show_rain, rules):
+    stations = get_registry().ordered(river)
+    ids = [s['id'] for s in stations]
+
+    latest = snap["latest"].set_index('station_id').reindex(ids).dropna(subset=['river']).reset_index()
+    table = pd.DataFrame({
+        'Station': latest['label'],
+        'Level': latest['level'].round(2).astype(str) + "m",
+        'Latest Reading': latest['timestamp'].dt.strftime("%d-%m-%Y @ %H:%M"),
+    }).to_html(index=False, border=0)
+
+    windows = snap["gspot_forecast"].set_index('station_id')
+    parts = []
+    for station in stations:
+        sid = station['id']
+        parts.append(f"<h3>{html.escape(station['label'])}</h3>")
+        hist = snap["history"][snap["history"]['station_id'] == sid].drop(columns='station_id')
+        if hist.empty:
+            parts.append("<p>No data.</p>")
+            continue
+        pred = snap["predictions"][snap["predictions"]['station_id'] == sid].drop(columns='station_id')
+        rain = snap["rainfall"][snap["rainfall"]['station_id'] == sid].drop(columns='station_id') if show_rain else None
+        chart, legend_items = station_chart(hist, pred=pred, rain=rain, gspot=sid in rules)
+        if sid in rules:
+            parts.append(gspot_banner(hist, windows.loc[sid] if sid in windows.index else None) or "")
+        parts.append(legend_html(legend_items))
+        spec = chart.properties(width="container").to_json(indent=None).replace("</", "<\\/")
+        parts.append(f'<script type="application/json" class="spec">{spec}</script><div class="chart"></div>')
+
+    nav = "".join(f'<a href="{page_name(r)}"{" class=active" if r == river else ""}>{r}</a>' for r in RIVERS)
+    logo = f'<img src="{LOGO.name}" alt="">' if LOGO.exists() else ""
+    icon = f'<link rel="icon" href="{LOGO.name}">\n' if LOGO.exists() else ""
+    return PAGE.format(river=river, nav=nav, table=table, stations="\n".join(parts), version=version, days=days,
+                       logo=logo, icon=icon)
+
+def write_atomic(path, text):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the static River Dipstick site from the latest snapshot")
+    parser.add_argument("--days", type=int, default=7, choices=read_model.RANGES)
+    parser.add_argument("--rain", action="store_true", help="include rainfall bars")
+    args = parser.parse_args()
+
+    version = read_model.snapshot_version()
+    if version is None:
+        logger.error("No current snapshot — run publish_snapshot.py first")
+        return
+
+    t0 = time.perf_counter()
+    snap = {name: read_model.read_snapshot(name, version) for name in ("latest", "gspot_forecast")}
+    for name in ("history", "predictions", "rainfall"):
+        snap[name] = read_model.read_snapshot(f"{name}_{args.days}", version)
+
+    SITE_DIR.mkdir(parents=True, exist_ok=True)
+    if LOGO.exists():
+        shutil.copy(LOGO, SITE_DIR / LOGO.name)
+    rules = get_rules()
+    for river in RIVERS:
+        write_atomic(SITE_DIR / page_name(river), river_page(river, snap, version, args.days, args.rain, rules))
+    write_atomic(SITE_DIR / "index.html",
+                 f'<!doctype html><meta http-equiv="refresh" content="0; url={page_name(RIVERS[0])}">')
+    logger.success(f"Built static site from snapshot {version} in {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    with profiled("build_site"):
+        main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+charts.py – the station chart, legend and G SPOT banner
+Shared by dashboard.py (Streamlit) and build_site.py (static pages), so both
+draw exactly the same thing from the same read-model frames.
+"""
+from datetime import datetime, UTC
+
+import altair as alt
+import pandas as pd
+
+from read_model import REAL_LABEL
+
+def station_chart(hist, pred=None, rain=None, gspot=False):
+    """
+    Level chart for one station as (chart, legend_items).
+    pred / rain: that station's predictions / rainfall, None or empty when switched off.
+    gspot: draw the good-level dots (station has rules and G SPOT is switched on).
+    """
+    chart_data = hist.copy()
+    legend_items = [(REAL_LABEL, "#ad36eeff")]
+
+    # Predictions
+    if pred is not None and not pred.empty:
+        now = datetime.now(UTC)
+        past = pred[pred['Date'] < now].copy()
+        past['Type'] = 'Past Performance'
+        future = pred[pred['Date'] >= now].copy()
+        future['Type'] = 'Future Prediction'
+        chart_data = pd.concat([chart_data, past, future], ignore_index=True)
+        legend_items += [("Past Performance", "#888888"), ("Future Prediction", "#BB22BB")]
+
+    # Rain
+    show_rain = rain is not None and not rain.empty
+    if show_rain:
+        chart_data = pd.concat([chart_data, rain], ignore_index=True)
+        legend_items.append((" Rainfall", "lightblue"))
+
+    # === MAIN LEVEL LINE ===
+    level_line = alt.Chart(chart_data).mark_line(strokeWidth=4).encode(
+        x=alt.X('Date:T', title='Date',
+                axis=alt.Axis(format='%b %d', tickCount=14)),
+        y=alt.Y('Level (metres):Q', axis=alt.Axis(title='Level (m)', titleColor='white')),
+        color=alt.Color('Type:N',
+            scale=alt.Scale(domain=[x[0] for x in legend_items], range=[x[1] for x in legend_items]),
+            legend=None
+        ),
+        strokeDash=alt.condition(
+            alt.datum.Type == REAL_LABEL,
+            alt.value([0]),
+            alt.value([6,4])
+        )
+    ).transform_filter(
+        alt.FieldOneOfPredicate(field='Type', oneOf=[x[0] for x in legend_items if 'Rainfall' not in x[0]])
+    )
+
+    # === G SPOT ===
+    if gspot:
+        gspot_rows = hist[hist.get('good_level') == 'y'].copy()
+        if not gspot_rows.empty:
+            gspot_dots = alt.Chart(gspot_rows).mark_circle(
+                size=10,
+                color='lime',
+                opacity=1,
+                stroke='lime',
+                strokeWidth=2
+            ).encode(
+                x='Date:T',
+                y=alt.Y('Level (metres):Q', title='Level (m)'),
+                tooltip=['Date:T', 'Level (metres):Q']
+            )
+            level_line = level_line + gspot_dots
+            legend_items.append(("Good Level", "lime"))
+
+    # === RAIN BARS ===
+    chart = level_line
+    if show_rain:
+        rain_bars = alt.Chart(chart_data).mark_bar(opacity=0.1, size=5).encode(
+            x=alt.X('Date:T'),
+            y=alt.Y('Rainfall (mm):Q', axis=alt.Axis(title='Rain (mm)', titleColor='white')),
+            color=alt.value('lightblue')
+        ).transform_filter(alt.datum.Type == 'Rainfall')
+        chart = alt.layer(level_line, rain_bars).resolve_scale(y='independent')
+    return chart, legend_items
+
+def gspot_banner(hist, window=None):
+    """Banner HTML: G SPOT now, else the next forecast window (a gspot_forecast row), else None."""
+    if not hist.empty and hist.iloc[-1].get('good_level') == 'y':
+        return """
+        <h4 style="color:limegreen; text-align:right; font-size:0.8rem;">
+        G Spot found, go fishing!!!
+        </h4>
+        """
+    if window is not None and pd.notna(window['window_start']):
+        start, end = pd.Timestamp(window['window_start']), pd.Timestamp(window['window_end'])
+        return f"""
+        <h4 style="color:limegreen; text-align:right; font-size:0.8rem;">
+        Next G Spot: {start:%a %H:%M} → {end:%a %H:%M}
+        </h4>
+        """
+    return None
+
+def legend_html(legend_items):
+    """Tiny right-aligned legend; empty when there is only the measured level."""
+    if len(legend_items) == 1:
+        return ""
+    html = '<div style="text-align:right; margin:10px 0; padding:6px; border-radius:8px; font-size:0.8em;">'
+    for label, color in legend_items:
+        html += f'<span style="margin:0 12px; display:inline-flex; align-items:center;">'
+        html += f'<div style="width:16px; height:4px; background:{color}; border-radius:2px; margin-right:6px;"></div>{label}</span>'
+    html += '</div>'
+    return html
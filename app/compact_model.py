@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+compact_model.py – sklearn-free inference for the HGBoost level models
+A fitted HistGradientBoostingRegressor is flattened into plain node arrays
+(feature, threshold, missing direction, children, leaf value) and saved as
+{sid}_hgboost.npz next to the pickle. Predicting walks every tree for every
+row at once with NumPy fancy indexing – no sklearn import, no per-call validation.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+ROW_CHUNK = 256  # keeps the (rows × trees) working arrays cache-sized
+
+def _sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+class CompactHGB:
+    def __init__(self, feature, threshold, missing_left, left, right, value, roots, depth, baseline, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.baseline = float(baseline)
+        self.feature_names = list(feature_names)
+        # children[node, went_left] – one gather per level instead of two plus a select
+        self._children = np.stack([right, left], axis=1).astype(np.intp)
+        self._feature = feature.astype(np.intp)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted HistGradientBoostingRegressor (numeric features, squared error)."""
+        if getattr(model, 'is_categorical_', None) is not None and np.any(model.is_categorical_):
+            raise ValueError("categorical features are not supported")
+        if model.n_trees_per_iteration_ != 1:
+            raise ValueError("only single-output regressors are supported")
+
+        feature, threshold, missing_left, left, right, value, roots = [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for (predictor,) in model._predictors:
+            nodes = predictor.nodes
+            n = len(nodes)
+            idx = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = nodes['is_leaf'].astype(bool)
+            # Leaves point at themselves, so a fixed number of steps lands every row on a leaf
+            left.append(np.where(leaf, idx, nodes['left'].astype(np.int32) + offset))
+            right.append(np.where(leaf, idx, nodes['right'].astype(np.int32) + offset))
+            feature.append(np.where(leaf, 0, nodes['feature_idx']).astype(np.int32))
+            threshold.append(nodes['num_threshold'].astype(np.float64))
+            missing_left.append(nodes['missing_go_to_left'].astype(bool))
+            value.append(np.where(leaf, nodes['value'], 0.0))
+            roots.append(offset)
+            depth = max(depth, int(nodes['depth'].max()))
+            offset += n
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            missing_left=np.concatenate(missing_left),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=depth,
+            baseline=np.ravel(model._baseline_prediction)[0],
+            feature_names=model.feature_names_in_,
+        )
+
+    def save(self, path, source_sha1=""):
+        np.savez_compressed(
+            path,
+            feature=self.feature, threshold=self.threshold, missing_left=self.missing_left,
+            left=self.left, right=self.right, value=self.value, roots=self.roots,
+            depth=self.depth, baseline=self.baseline,
+            feature_names=np.asarray(self.feature_names), source_sha1=source_sha1,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Returns (model, sha1 of the pickle it was exported from)."""
+        with np.load(path, allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        source = str(arrays.pop('source_sha1'))
+        return cls(**arrays), source
+
+    def predict(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.empty(len(X))
+        n_features = X.shape[1]
+        for start in range(0, len(X), ROW_CHUNK):
+            chunk = X[start:start + ROW_CHUNK]
+            flat = chunk.ravel()
+            row_base = (np.arange(len(chunk)) * n_features)[:, None]
+            node = np.broadcast_to(self.roots.astype(np.intp), (len(chunk), len(self.roots)))
+            for _ in range(self.depth):
+                x = flat[row_base + self._feature[node]]
+                # NaN compares False, so missing values only go left where the tree says so
+                go_left = (x <= self.threshold[node]) | (np.isnan(x) & self.missing_left[node])
+                node = self._children[node, go_left.view(np.uint8)]
+            out[start:start + len(chunk)] = self.value[node].sum(axis=1) + self.baseline
+        return out
+
+def export(pkl_path, npz_path=None):
+    """Compile one pickled model; returns the CompactHGB written."""
+    import joblib
+    npz_path = npz_path or pkl_path[:-len('.pkl')] + '.npz'
+    compact = CompactHGB.from_sklearn(joblib.load(pkl_path))
+    compact.save(npz_path, source_sha1=_sha1(pkl_path))
+    return compact
+
+def load_model(model_dir, station_id):
+    """
+    Compact model when a current export exists, else the sklearn pickle.
+    Returns None when the station has no model at all.
+    """
+    pkl_path = f"{model_dir}/{station_id}_hgboost.pkl"
+    npz_path = f"{model_dir}/{station_id}_hgboost.npz"
+    if os.path.exists(npz_path):
+        compact, source = CompactHGB.load(npz_path)
+        if not os.path.exists(pkl_path) or source == _sha1(pkl_path):
+            return compact
+    if os.path.exists(pkl_path):
+        import joblib
+        return joblib.load(pkl_path)
+    return None
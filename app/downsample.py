@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+downsample.py – Largest-Triangle-Three-Buckets for chart series
+A year of 15-minute readings is ~35k points per station; a chart only has
+about a thousand pixels to draw them in. LTTB keeps the points that carry the
+shape, and the series max/min plus any forced rows (G SPOT readings) are
+always kept on top of that.
+Rain is different: each reading is a total for its interval, so picking some
+of them understates it. bucket_sum() adds them up into fixed time buckets.
+"""
+import numpy as np
+import pandas as pd
+
+CHART_POINTS = 1000  # ~1 point per pixel of a full-width chart on the wide layout
+READING_STEP = pd.Timedelta(minutes=15)
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points LTTB keeps from sorted x; first and last always kept."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Interior points split into n_out - 2 buckets: bucket i is [edges[i], edges[i + 1])
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cx = np.concatenate([[0.0], np.cumsum(x)])
+    cy = np.concatenate([[0.0], np.cumsum(y)])
+    counts = np.diff(edges)
+    mean_x = (cx[edges[1:]] - cx[edges[:-1]]) / counts
+    mean_y = (cy[edges[1:]] - cy[edges[:-1]]) / counts
+    # Each bucket is scored against the centroid of the next one (the last point for the final bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample(df, y, n_out=CHART_POINTS, x='Date', keep=None):
+    """
+    Rows of df (sorted by x) that LTTB keeps for column y, plus the max and min
+    of y and every row where keep is True. Short series come back unchanged.
+    """
+    if len(df) <= n_out:
+        return df
+    values = df[y].to_numpy(dtype=float)
+    idx = np.flatnonzero(~np.isnan(values))
+    if len(idx) <= n_out:
+        return df
+
+    xs = pd.DatetimeIndex(df[x]).asi8[idx].astype(float)
+    mask = np.zeros(len(df), dtype=bool)
+    mask[idx[lttb(xs, values[idx], n_out)]] = True
+    mask[idx[np.argmax(values[idx])]] = True
+    mask[idx[np.argmin(values[idx])]] = True
+    if keep is not None:
+        mask |= np.asarray(keep, dtype=bool)
+    return df[mask]
+
+def downsample_by_station(df, y, n_out=CHART_POINTS, keep=None):
+    """downsample() applied to each station_id group of a multi-station frame."""
+    if df.empty:
+        return df
+    parts = [downsample(g, y, n_out, keep=None if keep is None else keep.loc[g.index])
+             for _, g in df.groupby('station_id', sort=False)]
+    return pd.concat(parts)
+
+def bucket_sum(df, y, n_out=CHART_POINTS, x='Date'):
+    """
+    Totals of y in fixed time buckets (a whole number of readings wide, at most
+    n_out of them), labelled by bucket start; empty buckets are left out.
+    Other columns must be constant within df (station_id, Type). Short series come back unchanged.
+    """
+    if len(df) <= n_out:
+        return df
+    t = pd.DatetimeIndex(df[x])
+    width = max(READING_STEP, ((t.max() - t.min()) / n_out).ceil(READING_STEP))
+    sums = pd.Series(df[y].to_numpy(dtype=float), index=t).resample(width).sum(min_count=1).dropna()
+    out = pd.DataFrame({x: sums.index, y: sums.to_numpy()})
+    for col in df.columns.drop([x, y]):
+        out[col] = df[col].iloc[0]
+    return out[df.columns]
+
+def bucket_sum_by_station(df, y, n_out=CHART_POINTS):
+    """bucket_sum() applied to each station_id group of a multi-station frame."""
+    if df.empty:
+        return df
+    return pd.concat([bucket_sum(g, y, n_out) for _, g in df.groupby('station_id', sort=False)], ignore_index=True)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+ea_api.py – GET against the EA flood-monitoring API, shared by the pipeline stages
+Retries, per-parameter request timings and failure counts (metrics.py), and
+_limit/_offset paging for ranges longer than the API's default 500 items.
+Importing it opens no connections and touches no files.
+
+    data = api_get(f"{EA_API_BASE}/id/stations/{sid}/readings", params={"latest": "", "parameter": "level"})
+    items = api_items(url, params={"parameter": "rainfall", "since": since, "_sorted": ""})
+"""
+import time
+
+import requests
+from loguru import logger
+
+import metrics
+
+PAGE = 2000  # items per request when paging
+
+def api_get(url, params=None):
+    """Decoded JSON, or None after three failed attempts."""
+    parameter = (params or {}).get("parameter", "")
+    for attempt in range(3):
+        try:
+            with metrics.timer("dipstick_ea_request_seconds", parameter=parameter):
+                resp = requests.get(url, params=params, timeout=10)
+                resp.raise_for_status()
+                return resp.json()
+        except requests.RequestException as e:
+            metrics.inc("dipstick_ea_request_failures_total", parameter=parameter)
+            logger.warning(f"API error (attempt {attempt+1}): {e}")
+            time.sleep(5)
+    return None
+
+def api_items(url, params=None, page=PAGE):
+    """
+    Every item of a readings query, fetched `page` at a time, or None if any
+    page failed: part of a newest-first series would hide the older readings.
+    """
+    items = []
+    while True:
+        data = api_get(url, params={**(params or {}), "_limit": page, "_offset": len(items)})
+        if data is None or "items" not in data:
+            return None
+        batch = data["items"]
+        items += batch
+        if len(batch) < page:
+            return items
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+features.py – shared feature build for the HGBoost level models
+Same lags / calendar / rolling columns the notebook trains on,
+plus the 24h recursive walk the live predictor uses (batched over origins)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+LAGS = [1, 3, 6, 12, 24]
+HORIZON = 24
+
+# Both series are bucketed to the hour in Postgres: levels averaged, rain summed.
+# Readings are TEXT timestamps, so they are cast once inside the bucket expression.
+# The current models were trained on the mean of the joined 15-minute rows
+# instead (rain 0 where the gauge stamp misses the level stamp), so the live
+# predictor keeps that default until the retrained models ship. Training
+# (ml_playground.ipynb) always asks for rain_agg="sum"; set RAIN_AGG=sum with
+# the new models.
+RAIN_AGG = os.getenv("RAIN_AGG", "mean")
+
+HOURLY_LEVEL_SQL = """
+    SELECT date_trunc('hour', timestamp::timestamptz AT TIME ZONE 'UTC') AS ts,
+           AVG(level) AS level
+    FROM readings
+    WHERE station_id = %s AND timestamp::timestamptz >= %s
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+HOURLY_RAIN_SQL = """
+    SELECT date_trunc('hour', timestamp::timestamptz AT TIME ZONE 'UTC') AS ts,
+           SUM(rainfall_mm) AS rain
+    FROM rainfall_readings
+    WHERE level_station_id = %s AND timestamp::timestamptz >= %s
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+# Multi-gauge catchment rain, already hourly (materialized by areal_rain.py)
+AREAL_RAIN_SQL = """
+    SELECT hour AT TIME ZONE 'UTC' AS ts, rainfall_mm AS rain
+    FROM areal_rainfall
+    WHERE station_id = %s AND hour >= %s
+    ORDER BY 1
+"""
+
+# Legacy rain feature: rain joined to level readings on the exact timestamp,
+# averaged per hour alongside the level
+JOINED_RAIN_SQL = """
+    SELECT date_trunc('hour', r.timestamp::timestamptz AT TIME ZONE 'UTC') AS ts,
+           AVG(COALESCE(rf.rainfall_mm, 0)) AS rain
+    FROM readings r
+    LEFT JOIN rainfall_readings rf ON rf.level_station_id = r.station_id
+                                  AND rf.timestamp::timestamptz = r.timestamp::timestamptz
+    WHERE r.station_id = %s AND r.timestamp::timestamptz >= %s
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+RAIN_SQL = {"gauge": HOURLY_RAIN_SQL, "areal": AREAL_RAIN_SQL}
+
+def load_hourly(engine, station_id, since, rain_source="gauge", rain_agg=None):
+    """
+    Hourly frame (naive UTC index): mean level, rain in mm.
+    rain_source: "gauge" (the station's single rainfall_id) or "areal" (weighted gauges).
+    rain_agg (gauge only, default RAIN_AGG): "sum" for the hourly total, hours with
+    no rain reading counting as dry; "mean" for the legacy joined mean, carried
+    forward over hours without levels as before.
+    Level gaps are forward-filled.
+    """
+    levels = pd.read_sql(HOURLY_LEVEL_SQL, engine, params=(station_id, since), index_col='ts')
+    if levels.empty:
+        return levels
+    rain_agg = rain_agg or RAIN_AGG
+    legacy = rain_source == "gauge" and rain_agg == "mean"
+    sql = JOINED_RAIN_SQL if legacy else RAIN_SQL[rain_source]
+    rain = pd.read_sql(sql, engine, params=(station_id, since), index_col='ts')
+
+    hours = pd.date_range(levels.index.min(), levels.index.max(), freq='h')
+    df = levels.reindex(hours).ffill()
+    if legacy:
+        df['rain'] = rain['rain'].reindex(hours).ffill().fillna(0.0)
+    else:
+        df['rain'] = rain['rain'].reindex(hours, fill_value=0.0).fillna(0.0)
+    df.index.name = 'ts'
+    return df
+
+def build_features(df):
+    """Lag / calendar / rolling features; rows without a full lag history are dropped."""
+    data = df.copy()
+    for lag in LAGS:
+        data[f'level_lag_{lag}'] = data['level'].shift(lag)
+        data[f'rain_lag_{lag}'] = data['rain'].shift(lag)
+    data['hour'] = data.index.hour
+    data['dayofweek'] = data.index.dayofweek
+    data['rolling_6h_mean'] = data['level'].rolling(6).mean()
+    return data.dropna()
+
+def recursive_forecast(model, X0, future_start, horizon=HORIZON):
+    """
+    Walk the one-step model forward `horizon` hours from every row of X0 at once.
+    future_start is the first forecast hour, one value per row (or a single Timestamp).
+    Returns an (n_rows, horizon) array; column k is the k-th step of the walk.
+    """
+    X = X0.copy()
+    n = len(X)
+    starts = pd.DatetimeIndex(np.broadcast_to(np.asarray(future_start, dtype='datetime64[ns]'), (n,)))
+    preds = np.empty((n, horizon))
+    for i in range(horizon):
+        preds[:, i] = model.predict(X)
+        X['level_lag_1'] = preds[:, i]
+        for lag in LAGS[1:]:
+            if i + 1 >= lag:
+                X[f'level_lag_{lag}'] = preds[:, i + 1 - lag]
+        step_times = starts + pd.Timedelta(hours=i)
+        X['hour'] = step_times.hour
+        X['dayofweek'] = step_times.dayofweek
+        # Rolling mean over a single predicted value is undefined; the live walk
+        # has always fed it as missing and the trees route it that way.
+        X['rolling_6h_mean'] = np.nan
+    return preds
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+forecast_gspot.py – "when will it fish?"
+Runs the G SPOT rules over each station's 24h forecast (after level_predictor.py)
+and stores the next predicted good-level window in gspot_forecast, one row per
+station, so readers answer it with a single lookup.
+Hourly forecasts are interpolated to 15 minutes and prefixed with the last 2h
+of real readings, so the falling window sees the same cadence as live data.
+"""
+import psycopg2
+from psycopg2.extras import execute_values
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from loguru import logger
+from dotenv import load_dotenv
+from gspot import rain_totals_for
+from rules import get_rules
+from refresh import notify
+from profiling import profiled
+from shards import is_leader
+import os
+
+load_dotenv()
+DB_PASS = os.getenv("DB_PASSWORD")
+CONN = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
+UTC = ZoneInfo("UTC")
+STEP = "15min"
+
+def init_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS gspot_forecast (
+            station_id TEXT PRIMARY KEY,
+            window_start TIMESTAMPTZ,
+            window_end TIMESTAMPTZ,
+            computed_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+
+def next_window(observed, forecast, rule, rain_total=None):
+    """
+    First run of forecast times that pass the rules, as (start, end) or (None, None).
+    observed / forecast: level Series on a UTC DatetimeIndex.
+    rain_total: rain to date for rules with a rain test (no rain forecast to add).
+    """
+    if not observed.empty:
+        forecast = forecast[forecast.index > observed.index.max()]
+    if forecast.empty or (rule.needs_rain and rain_total is None):
+        return None, None
+
+    # Forecast on the live 15-min cadence, continuing from the last real reading
+    knots = pd.concat([observed.iloc[-1:], forecast])
+    grid = pd.date_range(knots.index.min(), knots.index.max(), freq=STEP)
+    path = knots.reindex(knots.index.union(grid)).interpolate(method="time").reindex(grid)
+    series = pd.concat([observed.iloc[:-1], path])
+
+    hits = rule.evaluate(series.index, series.to_numpy(), rain_total)
+    if not observed.empty:
+        hits &= series.index > observed.index.max()
+    idx = np.flatnonzero(hits)
+    if not len(idx):
+        return None, None
+    breaks = np.flatnonzero(np.diff(idx) > 1)
+    last = idx[breaks[0]] if len(breaks) else idx[-1]
+    return series.index[idx[0]], series.index[last]
+
+def main():
+    if not is_leader(CONN, "forecast_gspot"):
+        return
+    stations = get_rules()
+    if not stations:
+        logger.warning("No G SPOT rules — nothing to forecast")
+        return
+    sids = list(stations)
+
+    conn = psycopg2.connect(CONN)
+    cur = conn.cursor()
+    init_table(cur)
+
+    # Two queries for every station: recent readings (falling lead-in) + future predictions
+    cur.execute("""
+        SELECT station_id, timestamp::timestamptz, level FROM readings
+        WHERE station_id = ANY(%s) AND level IS NOT NULL
+          AND timestamp::timestamptz >= NOW() - INTERVAL '3 hours'
+    """, (sids,))
+    observed = pd.DataFrame(cur.fetchall(), columns=["station_id", "ts", "level"])
+    cur.execute("""
+        SELECT station_id, predicted_for, predicted_level FROM predictions
+        WHERE station_id = ANY(%s) AND predicted_for >= NOW() - INTERVAL '2 hours'
+    """, (sids,))
+    predicted = pd.DataFrame(cur.fetchall(), columns=["station_id", "ts", "level"])
+    for df in (observed, predicted):
+        df["ts"] = pd.to_datetime(df["ts"], utc=True)
+
+    results = []
+    for sid, rule in stations.items():
+        obs = observed[observed["station_id"] == sid].set_index("ts")["level"].sort_index()
+        obs = obs[obs.index >= obs.index.max() - rule.window]
+        fc = predicted[predicted["station_id"] == sid].set_index("ts")["level"].sort_index()
+        rain = rain_totals_for(cur, sid, rule, obs.index[-1:])
+        start, end = next_window(obs, fc, rule, None if rain is None else rain[0])
+        results.append((sid, start, end))
+        if start is not None:
+            logger.success(f"{sid}: next G SPOT {start:%a %H:%M} → {end:%a %H:%M} UTC")
+        else:
+            logger.info(f"{sid}: no G SPOT in the forecast")
+
+    execute_values(cur, """
+        INSERT INTO gspot_forecast (station_id, window_start, window_end, computed_at) VALUES %s
+        ON CONFLICT (station_id) DO UPDATE SET window_start = EXCLUDED.window_start,
+            window_end = EXCLUDED.window_end, computed_at = EXCLUDED.computed_at
+    """, [(sid, s, e, datetime.now(UTC)) for sid, s, e in results],
+        template="(%s, %s::timestamptz, %s::timestamptz, %s)", page_size=len(results))
+    conn.commit()
+    conn.close()
+    notify(CONN, "gspot_forecast")
+    print("Forecast G SPOT windows updated!")
+
+if __name__ == "__main__":
+    with profiled("forecast_gspot"):
+        main()
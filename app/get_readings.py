@@ -4,23 +4,58 @@ get_readings.py - 15-min collection
 Optimized: Fresh data check + 2-day gap backfill + retry + logging
 """
 
-import requests
 import psycopg2
 from datetime import datetime, timedelta, UTC
 import time
 from loguru import logger
-from river_reference import STATIONS
+from river_reference import STATIONS, EA_API_BASE
+from refresh import notify
+import metrics
+from ea_api import api_get
+from profiling import profiled
+from shards import Shard, WORKER
+from spool import Spool, replay
 from dotenv import load_dotenv
 import os
 load_dotenv()
 DB_PASS = os.getenv("DB_PASSWORD")
 CONNECTION_STRING = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
+NEW_ROWS = 0  # rows this run actually added; dashboards are only told if > 0
+CONNECT_TIMEOUT = 10
+DB_DOWN = False  # set on the first failed connect; the rest of the run spools without waiting
+
+# Rows the database could not take are spooled and replayed at the start of the next run
+SPOOL = Spool("get_readings")
+SPOOL_INSERTS = {
+    "readings": "INSERT INTO readings (station_id, river, label, level, timestamp) VALUES %s ON CONFLICT DO NOTHING",
+    "rainfall_readings": "INSERT INTO rainfall_readings (level_station_id, rainfall_station_id, rainfall_mm, timestamp) "
+                         "VALUES %s ON CONFLICT DO NOTHING",
+}
 
 # --------------------------------------------------------------------------- #
 # DATABASE
 # --------------------------------------------------------------------------- #
+def connect():
+    global DB_DOWN
+    if DB_DOWN:
+        raise psycopg2.OperationalError("database unavailable earlier in this run")
+    try:
+        return psycopg2.connect(CONNECTION_STRING, connect_timeout=CONNECT_TIMEOUT)
+    except psycopg2.OperationalError:
+        DB_DOWN = True
+        raise
+
+def spool_row(table, row, error):
+    SPOOL.add(table, row)
+    metrics.inc("dipstick_rows_total", table=table, result="spooled")
+    logger.warning(f"DB write failed, {table} row spooled: {str(error).strip()}")
+
 def init_db():
-    conn = psycopg2.connect(CONNECTION_STRING)
+    try:
+        conn = connect()
+    except psycopg2.OperationalError as e:
+        logger.error(f"Database unavailable, readings will be spooled: {e}")
+        return
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS readings (
@@ -46,25 +81,11 @@ def init_db():
     conn.commit()
     conn.close()
 
-# --------------------------------------------------------------------------- #
-# API WITH RETRY
-# --------------------------------------------------------------------------- #
-def api_get(url, params=None):
-    for attempt in range(3):
-        try:
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.RequestException as e:
-            logger.warning(f"API error (attempt {attempt+1}): {e}")
-            time.sleep(5)
-    return None
-
 # --------------------------------------------------------------------------- #
 # LEVELS
 # --------------------------------------------------------------------------- #
 def get_latest_river_level(station_id):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{station_id}/readings"
     data = api_get(url, params={"latest": "", "parameter": "level"})
     if data and 'items' in data and data['items']:
         item = data['items'][0]
@@ -72,24 +93,33 @@ def get_latest_river_level(station_id):
     return None, None
 
 def fetch_missing_readings(station_id, since_date):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{station_id}/readings"
     data = api_get(url, params={"parameter": "level", "since": since_date, "_sorted": ""})
     if data and 'items' in data:
         return [(item['value'], item['dateTime']) for item in data['items']]
     return []
 
 def insert_reading(station_id, river, label, level, timestamp):
-    conn = psycopg2.connect(CONNECTION_STRING)
+    global NEW_ROWS
+    try:
+        conn = connect()
+    except psycopg2.OperationalError as e:
+        return spool_row("readings", (station_id, river, label, level, timestamp), e)
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO readings (station_id, river, label, level, timestamp)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (station_id, timestamp) DO NOTHING
-        ''', (station_id, river, label, level, timestamp))
+        with metrics.timer("dipstick_db_seconds", op="insert_reading"):
+            cursor.execute('''
+                INSERT INTO readings (station_id, river, label, level, timestamp)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (station_id, timestamp) DO NOTHING
+            ''', (station_id, river, label, level, timestamp))
+        metrics.inc("dipstick_rows_total", table="readings", result="inserted" if cursor.rowcount else "duplicate")
         if cursor.rowcount:
+            NEW_ROWS += 1
             logger.info(f"Inserted level {level:.3f}m for {label} ({station_id})")
         conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        spool_row("readings", (station_id, river, label, level, timestamp), e)
     except Exception as e:
         logger.error(f"DB insert error: {e}")
     finally:
@@ -99,7 +129,7 @@ def insert_reading(station_id, river, label, level, timestamp):
 # RAINFALL
 # --------------------------------------------------------------------------- #
 def get_latest_rainfall(rainfall_id):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{rainfall_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{rainfall_id}/readings"
     data = api_get(url, params={"latest": "", "parameter": "rainfall"})
     if data and 'items' in data and data['items']:
         item = data['items'][0]
@@ -107,22 +137,30 @@ def get_latest_rainfall(rainfall_id):
     return None, None
 
 def fetch_missing_rainfall(rainfall_id, since_date):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{rainfall_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{rainfall_id}/readings"
     data = api_get(url, params={"parameter": "rainfall", "since": since_date, "_sorted": ""})
     if data and 'items' in data:
         return [(item['value'], item['dateTime']) for item in data['items']]
     return []
 
 def insert_rainfall(level_station_id, rainfall_station_id, rainfall_mm, timestamp):
-    conn = psycopg2.connect(CONNECTION_STRING)
+    global NEW_ROWS
+    row = (level_station_id, rainfall_station_id, rainfall_mm, timestamp)
+    try:
+        conn = connect()
+    except psycopg2.OperationalError as e:
+        return spool_row("rainfall_readings", row, e)
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO rainfall_readings (level_station_id, rainfall_station_id, rainfall_mm, timestamp)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (level_station_id, timestamp) DO NOTHING
-        ''', (level_station_id, rainfall_station_id, rainfall_mm, timestamp))
+        with metrics.timer("dipstick_db_seconds", op="insert_rainfall"):
+            cursor.execute('''
+                INSERT INTO rainfall_readings (level_station_id, rainfall_station_id, rainfall_mm, timestamp)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (level_station_id, timestamp) DO NOTHING
+            ''', (level_station_id, rainfall_station_id, rainfall_mm, timestamp))
+        metrics.inc("dipstick_rows_total", table="rainfall_readings", result="inserted" if cursor.rowcount else "duplicate")
         if cursor.rowcount:
+            NEW_ROWS += 1
             logger.info(f"Inserted rainfall {rainfall_mm}mm for {level_station_id} from {rainfall_station_id}")
         conn.commit()
     except psycopg2.errors.UndefinedObject:
@@ -133,8 +171,11 @@ def insert_rainfall(level_station_id, rainfall_station_id, rainfall_mm, timestam
             ON CONFLICT DO NOTHING
         ''', (level_station_id, rainfall_station_id, rainfall_mm, timestamp))
         if cursor.rowcount:
+            NEW_ROWS += 1
             logger.info(f"Inserted rainfall {rainfall_mm}mm for {level_station_id} (fallback)")
         conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        spool_row("rainfall_readings", row, e)
     except Exception as e:
         logger.error(f"DB insert error: {e}")
     finally:
@@ -144,10 +185,14 @@ def insert_rainfall(level_station_id, rainfall_station_id, rainfall_mm, timestam
 # GAPS (2 DAYS)
 # --------------------------------------------------------------------------- #
 def has_gaps(station_id, days=7):
-    conn = psycopg2.connect(CONNECTION_STRING)
+    try:
+        conn = connect()
+    except psycopg2.OperationalError:
+        return False  # nothing to compare against; this run's readings are spooled
     cursor = conn.cursor()
     since = (datetime.now(UTC) - timedelta(hours=24)).replace(microsecond=0).isoformat()
-    cursor.execute("SELECT COUNT(*) FROM readings WHERE station_id = %s AND timestamp >= %s", (station_id, since))
+    with metrics.timer("dipstick_db_seconds", op="gap_check"):
+        cursor.execute("SELECT COUNT(*) FROM readings WHERE station_id = %s AND timestamp >= %s", (station_id, since))
     count = cursor.fetchone()[0]
     expected = days * 96  # 15-min
     conn.close()
@@ -157,36 +202,51 @@ def has_gaps(station_id, days=7):
 # MAIN
 # --------------------------------------------------------------------------- #
 if __name__ == "__main__":
-    init_db()
-    logger.info("Starting 15-min collection")
-
-    for river, stations in STATIONS.items():
-        for station in stations:
-            sid = station['id']
-            label = station['label']
-            rain_id = station.get('rainfall_id')
-
-            # Level
-            level, ts = get_latest_river_level(sid)
-            if level is not None:
-                insert_reading(sid, river, label, level, ts)
-
-            # Rainfall
-            if rain_id:
-                rain, rts = get_latest_rainfall(rain_id)
-                if rain is not None:
-                    insert_rainfall(sid, rain_id, rain, rts or ts)
-
-            # Gap backfill (2 days)
-            if has_gaps(sid):
-                logger.warning(f"Gaps in {sid} — backfilling 2 days")
-                since = (datetime.now(UTC) - timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
-                for l, t in fetch_missing_readings(sid, since):
-                    insert_reading(sid, river, label, l, t)
-                if rain_id:
-                    for r, t in fetch_missing_rainfall(rain_id, since):
-                        insert_rainfall(sid, rain_id, r, t)
-
-            time.sleep(1)
-
-    logger.info("Collection complete")
\ No newline at end of file
+    with profiled("get_readings"):
+        init_db()
+        if not DB_DOWN:
+            NEW_ROWS += replay(CONNECTION_STRING, "get_readings", SPOOL_INSERTS, CONNECT_TIMEOUT)
+        logger.info("Starting 15-min collection")
+        # Unsharded when the database is already known to be down
+        shard = Shard(CONNECTION_STRING, "get_readings", worker=None if DB_DOWN else WORKER,
+                      connect_timeout=CONNECT_TIMEOUT)
+
+        try:
+            for river, stations in STATIONS.items():
+                for station in shard.claimed(stations, key=lambda s: s['id']):
+                    sid = station['id']
+                    label = station['label']
+                    rain_id = station.get('rainfall_id')
+
+                    # Level
+                    level, ts = get_latest_river_level(sid)
+                    if level is not None:
+                        insert_reading(sid, river, label, level, ts)
+                        age = datetime.now(UTC) - datetime.fromisoformat(ts.replace('Z', '+00:00'))
+                        metrics.set_gauge("dipstick_reading_age_seconds", int(age.total_seconds()), station=sid)
+
+                    # Rainfall
+                    if rain_id:
+                        rain, rts = get_latest_rainfall(rain_id)
+                        if rain is not None:
+                            insert_rainfall(sid, rain_id, rain, rts or ts)
+
+                    # Gap backfill (2 days)
+                    if has_gaps(sid):
+                        logger.warning(f"Gaps in {sid} — backfilling 2 days")
+                        since = (datetime.now(UTC) - timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+                        for l, t in fetch_missing_readings(sid, since):
+                            insert_reading(sid, river, label, l, t)
+                        if rain_id:
+                            for r, t in fetch_missing_rainfall(rain_id, since):
+                                insert_rainfall(sid, rain_id, r, t)
+
+                    SPOOL.flush()  # one fsync per station
+                    time.sleep(1)
+        finally:
+            SPOOL.flush()  # whatever happened, rows already spooled are kept
+            shard.close()
+        logger.info("Collection complete")
+        if NEW_ROWS:
+            notify(CONNECTION_STRING, "readings")
+        metrics.write("get_readings")
\ No newline at end of file
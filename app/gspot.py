@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+gspot.py – vectorized building blocks for G SPOT evaluation over whole series
+The rule parameters themselves come from rules.py; this module only knows
+how to compute windows fast and how to write flags back in bulk.
+"""
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+def falling_mask(ts, levels, window, min_points, max_rises, rise_tol):
+    """Per reading: is the trailing window [ts - window, ts] falling? ts must be sorted."""
+    ts = np.asarray(ts, dtype='datetime64[ns]')
+    levels = np.asarray(levels, dtype=float)
+    start = np.searchsorted(ts, ts - np.timedelta64(window), side='left')
+    count = np.arange(len(ts)) - start + 1
+
+    # rise[j] marks the step (j-1 → j); steps inside the window are start < j <= i
+    rise = np.zeros(len(ts), dtype=np.int64)
+    rise[1:] = levels[:-1] < levels[1:] - rise_tol
+    cum = np.cumsum(rise)
+    rises = cum - cum[start]
+    return (count >= min_points) & (rises <= max_rises)
+
+def trailing_sum(ts, event_ts, values, window):
+    """Sum of values with event time in (ts - window, ts], for every ts (both sorted)."""
+    ts = np.asarray(ts, dtype='datetime64[ns]')
+    event_ts = np.asarray(event_ts, dtype='datetime64[ns]')
+    cum = np.concatenate([[0.0], np.cumsum(np.asarray(values, dtype=float))])
+    hi = np.searchsorted(event_ts, ts, side='right')
+    lo = np.searchsorted(event_ts, ts - np.timedelta64(window), side='right')
+    return cum[hi] - cum[lo]
+
+def rain_totals_for(cur, station_id, rule, ts):
+    """Trailing rain per reading for rules with a rain test (one query), else None."""
+    if not rule.needs_rain or len(ts) == 0:
+        return None
+    ts = pd.DatetimeIndex(ts)
+    cur.execute("""
+        SELECT timestamp::timestamptz, rainfall_mm FROM rainfall_readings
+        WHERE level_station_id = %s AND rainfall_mm IS NOT NULL
+          AND timestamp::timestamptz > %s AND timestamp::timestamptz <= %s
+    """, (station_id, (ts.min() - rule.rain_window).to_pydatetime(), ts.max().to_pydatetime()))
+    rain = pd.DataFrame(cur.fetchall(), columns=["ts", "mm"])
+    rain["ts"] = pd.to_datetime(rain["ts"], utc=True)
+    rain = rain.sort_values("ts")
+    return rule.rain_totals(ts, rain["ts"], rain["mm"])
+
+def write_flags(cur, station_id, timestamps, flags):
+    """Write good_level for many readings of one station in a single UPDATE."""
+    rows = [(station_id, ts, flag) for ts, flag in zip(timestamps, flags)]
+    if not rows:
+        return 0
+    execute_values(cur, """
+        UPDATE readings AS r SET good_level = v.flag
+        FROM (VALUES %s) AS v(station_id, ts, flag)
+        WHERE r.station_id = v.station_id AND r.timestamp = v.ts
+    """, rows, page_size=len(rows))
+    return len(rows)
@@ -5,20 +5,33 @@ Dynamic lookback: limited to available rainfall data range
 """
 import pandas as pd
 from sqlalchemy import create_engine, text
-import joblib
 import os
 from datetime import datetime, timedelta
 from river_reference import STATIONS
+from features import HORIZON, load_hourly, build_features, recursive_forecast
+from compact_model import load_model
+from refresh import notify
+import metrics
+from profiling import profiled
+from shards import Shard
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
 
 DB_PASSWORD = os.getenv("DB_PASSWORD")
-engine = create_engine(f"postgresql://river_user:{DB_PASSWORD}@db/river_levels_db")
+DB_URL = f"postgresql://river_user:{DB_PASSWORD}@db/river_levels_db"
+engine = create_engine(DB_URL)
 MODEL_DIR = "/app/models"
+# "areal" feeds the multi-gauge catchment rain from areal_rain.py; models must be
+# retrained on it first, so the single-gauge series stays the default.
+RAIN_SOURCE = os.getenv("RAIN_SOURCE", "gauge")
+RAIN_START_SQL = {
+    "gauge": "SELECT MIN(timestamp::timestamptz) AS min_ts FROM rainfall_readings WHERE level_station_id = %s",
+    "areal": "SELECT MIN(hour) AS min_ts FROM areal_rainfall WHERE station_id = %s",
+}
 
 def insert_prediction(station_id, level, predicted_for):
     ts_str = predicted_for.strftime('%Y-%m-%d %H:%M:%S')
-    with engine.connect() as conn:
+    with engine.connect() as conn, metrics.timer("dipstick_db_seconds", op="insert_prediction"):
         conn.execute(
             text("""
                 INSERT INTO predictions (station_id, predicted_level, predicted_for, created_at)
@@ -30,85 +43,63 @@ def insert_prediction(station_id, level, predicted_for):
         )
         conn.commit()
 
-print("Starting live prediction run...")
+def main():
+    print("Starting live prediction run...")
+    updated = 0
+    shard = Shard(DB_URL, "level_predictor")
 
-for river, stations in STATIONS.items():
-    for station in stations:
-        sid = station['id']
-        model_path = f"{MODEL_DIR}/{sid}_hgboost.pkl"
-        if not os.path.exists(model_path):
-            continue
-        model = joblib.load(model_path)
+    for river, stations in STATIONS.items():
+        for station in shard.claimed(stations, key=lambda s: s['id']):
+            sid = station['id']
+            model = load_model(MODEL_DIR, sid)
+            if model is None:
+                continue
 
-        # Step 1: Find earliest available rainfall timestamp for this station
-        rain_start_query = f"""
-            SELECT MIN(timestamp::timestamptz) AS min_ts
-            FROM rainfall_readings
-            WHERE level_station_id = %s
-        """
-        rain_start_df = pd.read_sql(rain_start_query, engine, params=(sid,))
-        if rain_start_df['min_ts'].iloc[0] is None:
-            print(f"No rainfall data for {sid} — skipping")
-            continue
-        rain_start = rain_start_df['min_ts'].iloc[0]
+            # Step 1: Find earliest available rainfall timestamp for this station
+            rain_start_df = pd.read_sql(RAIN_START_SQL[RAIN_SOURCE], engine, params=(sid,))
+            if rain_start_df['min_ts'].iloc[0] is None:
+                print(f"No rainfall data for {sid} — skipping")
+                continue
+            rain_start = rain_start_df['min_ts'].iloc[0]
 
-        # Step 2: Pull level + rain data from that start date onward
-        df = pd.read_sql(f"""
-            SELECT r.timestamp::timestamptz AT TIME ZONE 'UTC' as ts, r.level,
-                   COALESCE(rf.rainfall_mm, 0) as rain
-            FROM readings r
-            LEFT JOIN rainfall_readings rf ON rf.level_station_id = r.station_id
-                                          AND rf.timestamp::timestamptz = r.timestamp::timestamptz
-            WHERE r.station_id = %s AND r.timestamp::timestamptz >= %s
-            ORDER BY r.timestamp
-        """, engine, params=(sid, rain_start))
+            # Step 2: Pull hourly level + rain data from that start date onward
+            with metrics.timer("dipstick_db_seconds", op="load_hourly"):
+                df = load_hourly(engine, sid, rain_start, RAIN_SOURCE)
 
-        if df.empty or len(df) < 50:
-            print(f"Not enough data for {sid} after rainfall start")
-            continue
+            if df.empty or len(df) < 50:
+                print(f"Not enough data for {sid} after rainfall start")
+                continue
 
-        df['ts'] = pd.to_datetime(df['ts']).dt.tz_localize(None)
-        df = df.set_index('ts').sort_index().resample('h').mean().ffill()
+            # Features
+            data = build_features(df)
 
-        # Features
-        data = df.copy()
-        for lag in [1,3,6,12,24]:
-            data[f'level_lag_{lag}'] = data['level'].shift(lag)
-            data[f'rain_lag_{lag}'] = data['rain'].shift(lag)
-        data['hour'] = data.index.hour
-        data['dayofweek'] = data.index.dayofweek
-        data['rolling_6h_mean'] = data['level'].rolling(6).mean()
-        data = data.dropna()
+            if len(data) < 24:
+                print(f"Insufficient feature data for {sid}")
+                continue
 
-        if len(data) < 24:
-            print(f"Insufficient feature data for {sid}")
-            continue
+            X = data.drop(columns=['level'])
+            current_features = X.iloc[-1:].copy()
 
-        X = data.drop(columns=['level'])
-        current_features = X.iloc[-1:].copy()
+            # Predict next 24 hours iteratively
+            now = datetime.now()
+            future_start = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            future_times = pd.date_range(start=future_start, periods=HORIZON, freq='h')
+            with metrics.timer("dipstick_model_predict_seconds"):
+                preds = recursive_forecast(model, current_features, future_start)[0]
 
-        # Predict next 24 hours iteratively
-        now = datetime.now()
-        future_start = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        future_times = pd.date_range(start=future_start, periods=24, freq='h')
-        preds = []
-        features = current_features.copy()
-        for i in range(24):
-            pred = model.predict(features)[0]
-            preds.append(pred)
-            features = features.copy()
-            features['level_lag_1'] = pred
-            for lag in [3,6,12,24]:
-                if i + 1 >= lag:
-                    features[f'level_lag_{lag}'] = preds[i + 1 - lag]
-            features['hour'] = future_times[i].hour
-            features['dayofweek'] = future_times[i].dayofweek
-            features['rolling_6h_mean'] = pd.Series(features['level_lag_1']).rolling(6).mean().iloc[-1]
+            # Insert
+            for ts, pred in zip(future_times, preds):
+                insert_prediction(sid, round(float(pred), 6), ts)
 
-        # Insert
-        for ts, pred in zip(future_times, preds):
-            insert_prediction(sid, round(float(pred), 6), ts)
+            updated += 1
+            print(f"Updated 24h future for {sid} — {station['label']}")
 
-        print(f"Updated 24h future for {sid} — {station['label']}")
+    shard.close()
+    if updated:
+        notify(DB_URL, "predictions")
+    metrics.write("level_predictor")
+    print("Live prediction run complete — refresh site!")
 
-print("Live prediction run complete — refresh site!")
\ No newline at end of file
+if __name__ == "__main__":
+    with profiled("level_predictor"):
+        main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+metrics.py – pipeline metrics in Prometheus text format, no client library
+Each collector stage records counters / gauges / histograms while it runs and
+calls write(stage) at the end; that renders one textfile per stage into
+METRICS_DIR (atomically, node_exporter textfile-collector style). api.py
+serves all of them at /metrics. Sharded collectors (shards.py) write one file
+per worker and label their samples worker="<name>". Counters and histograms are cumulative across
+runs, as Prometheus expects: write() adds this run's values to the ones in the
+stage's previous textfile.
+
+    with timer("dipstick_db_seconds", op="insert"):
+        ...
+    inc("dipstick_rows_total", table="readings", result="inserted")
+    write("get_readings")
+"""
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from shards import WORKER, tagged
+
+METRICS_DIR = Path(os.getenv("METRICS_DIR", "/app/data/metrics"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HELP = {
+    "dipstick_stage_seconds": "Wall time of the last run of a pipeline stage",
+    "dipstick_stage_last_run_timestamp_seconds": "When a pipeline stage last finished",
+    "dipstick_ea_request_seconds": "Latency of EA flood-monitoring API requests",
+    "dipstick_ea_request_failures_total": "EA API attempts that raised",
+    "dipstick_db_seconds": "Time spent in database calls",
+    "dipstick_rows_total": "Rows offered to the database, by outcome",
+    "dipstick_model_predict_seconds": "Model time for one station's 24h forecast",
+    "dipstick_reading_age_seconds": "Age of the newest reading seen for a station",
+    "dipstick_gspot_hits_total": "New G SPOT flags written",
+}
+
+# name -> {"type": ..., "samples": {labels tuple: value or histogram state}}
+_metrics = {}
+
+def _series(name, kind):
+    return _metrics.setdefault(name, {"type": kind, "samples": {}})["samples"]
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    samples = _series(name, "counter")
+    samples[_key(labels)] = samples.get(_key(labels), 0) + value
+
+def set_gauge(name, value, **labels):
+    _series(name, "gauge")[_key(labels)] = value
+
+def observe(name, value, **labels):
+    h = _series(name, "histogram").setdefault(_key(labels), {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            h["buckets"][i] += 1
+    h["sum"] += value
+    h["count"] += 1
+
+@contextmanager
+def timer(name, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+def _fmt(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def render(stage):
+    """Text exposition of everything recorded; every sample carries stage="<stage>" (and worker="<name>" when sharded)."""
+    lines = []
+    for name, m in sorted(_metrics.items()):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {m['type']}")
+        for labels, value in sorted(m["samples"].items()):
+            labels = _key({**dict(labels), "stage": stage, **({"worker": WORKER} if WORKER else {})})
+            if m["type"] != "histogram":
+                lines.append(f"{name}{_fmt(labels)} {value}")
+                continue
+            for bound, n in zip(BUCKETS, value["buckets"]):
+                lines.append(f"{name}_bucket{_fmt(labels, [('le', bound)])} {n}")
+            lines.append(f"{name}_bucket{_fmt(labels, [('le', '+Inf')])} {value['count']}")
+            lines.append(f"{name}_sum{_fmt(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_fmt(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+_LINE = re.compile(r'^(\w+?)(_bucket|_sum|_count)?(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+def _carry_over(path):
+    """Add the counter / histogram totals of a previous textfile into this run's."""
+    try:
+        text = path.read_text()
+    except OSError:
+        return
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            types[name] = kind
+            continue
+        m = _LINE.match(line)
+        if not m:
+            continue
+        name, suffix, labels, value = m.groups()
+        if suffix and types.get(name) != "histogram":
+            name, suffix = name + suffix, None  # e.g. a counter that happens to end in _count
+        kind = types.get(name)
+        labels = {k: v for k, v in _LABEL.findall(labels or "") if k not in ("stage", "worker")}
+        value = float(value)
+        value = int(value) if value.is_integer() else value
+        if kind == "counter":
+            inc(name, value, **labels)
+        elif kind == "histogram":
+            le = labels.pop("le", None)
+            h = _series(name, "histogram").setdefault(
+                _key(labels), {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+            if suffix == "_sum":
+                h["sum"] += value
+            elif suffix == "_count":
+                h["count"] += value
+            elif le != "+Inf" and float(le) in BUCKETS:
+                h["buckets"][BUCKETS.index(float(le))] += value
+
+_started = time.perf_counter()
+
+def write(stage):
+    """Stamp the stage's duration and write its textfile; call once at the end of a run."""
+    set_gauge("dipstick_stage_seconds", round(time.perf_counter() - _started, 3))
+    set_gauge("dipstick_stage_last_run_timestamp_seconds", int(time.time()))
+    path = METRICS_DIR / f"{tagged(stage)}.prom"
+    _carry_over(path)
+    try:
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = METRICS_DIR / f".{tagged(stage)}.prom.tmp"
+        tmp.write_text(render(stage))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # metrics must never fail a collector run
+
+def collect():
+    """Every stage's textfile merged into one exposition (one HELP/TYPE per family) for /metrics."""
+    families = {}
+    for path in sorted(METRICS_DIR.glob("*.prom")) if METRICS_DIR.exists() else []:
+        name = None
+        for line in path.read_text().splitlines():
+            if line.startswith("# HELP "):
+                name = line.split()[2]
+                families.setdefault(name, [line, None])
+            elif line.startswith("# TYPE "):
+                families[name][1] = line
+            elif line:
+                families[name].append(line)
+    return "".join("\n".join(lines) + "\n" for _, lines in sorted(families.items()))
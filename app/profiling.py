@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+profiling.py – opt-in cProfile for pipeline runs and dashboard reruns
+Off unless PROFILE names the stage (PROFILE=get_readings,update_gspot or
+PROFILE=all) or the script is started with --profile. A profiled run dumps
+its pstats to PROFILE_DIR/<stage>[-<worker>]-<time>.prof, keeps the newest
+PROFILE_KEEP dumps per stage and worker, and logs the PROFILE_TOP hottest functions by cumulative
+time. Open a dump with `python -m pstats <file>` or snakeviz.
+
+    if __name__ == "__main__":
+        with profiled("level_predictor"):
+            main()
+
+    PROFILE=level_predictor python /app/level_predictor.py
+    python /app/utility/backfill_gspot.py --profile --start 2025-01-01
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+from contextlib import contextmanager
+from datetime import datetime, UTC
+from pathlib import Path
+
+from loguru import logger
+
+from shards import tagged
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/app/logs/profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+# Read once per process (Streamlit reruns reuse it) and taken out of argv so
+# the scripts' own argparse never sees it
+PROFILE_FLAG = "--profile" in sys.argv
+if PROFILE_FLAG:
+    sys.argv.remove("--profile")
+
+def enabled(stage):
+    wanted = {s.strip() for s in os.getenv("PROFILE", "").split(",")}
+    return PROFILE_FLAG or bool(wanted & {stage, "all", "1"})
+
+@contextmanager
+def profiled(stage):
+    """Profile the body when profiling is on for `stage`; otherwise a no-op."""
+    if not enabled(stage):
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        _report(stage, prof)
+
+def _report(stage, prof):
+    out = io.StringIO()
+    stats = pstats.Stats(prof, stream=out)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    logger.info(f"Profile of {stage} — top {PROFILE_TOP} by cumulative time:\n{out.getvalue()}")
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        # Workers share the volume: each keeps (and rotates) only its own dumps
+        prefix = tagged(stage)
+        path = PROFILE_DIR / f"{prefix}-{datetime.now(UTC):%Y%m%dT%H%M%S%f}.prof"
+        stats.dump_stats(path)
+        for old in sorted(PROFILE_DIR.glob(f"{prefix}-*.prof"))[:-PROFILE_KEEP]:
+            old.unlink(missing_ok=True)
+        logger.info(f"Profile written to {path}")
+    except OSError as e:
+        logger.warning(f"Could not write profile for {stage}: {e}")  # never fail the run over it
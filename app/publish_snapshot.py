@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+publish_snapshot.py – last step of the collector cycle
+Writes the dashboard's read model to /app/data/snapshot: latest readings,
+the G SPOT forecast, and every station's downsampled history, predictions
+and rainfall for each history range the dashboard offers.
+The longest range is queried once and cut down in memory for the others.
+"""
+import os
+import time
+
+import psycopg2
+from loguru import logger
+from dotenv import load_dotenv
+
+import read_model
+from read_model import RANGES
+from refresh import notify
+from profiling import profiled
+from shards import is_leader
+from river_reference import STATIONS
+
+load_dotenv()
+DB_PASS = os.getenv("DB_PASSWORD")
+CONN = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
+
+def main():
+    if not is_leader(CONN, "publish_snapshot"):
+        return
+    t0 = time.perf_counter()
+    ids = sorted(s['id'] for stations in STATIONS.values() for s in stations)
+
+    conn = psycopg2.connect(CONN)
+    frames = {
+        "latest": read_model.latest_readings(conn),
+        "gspot_forecast": read_model.gspot_forecast(conn),
+    }
+    longest = max(RANGES)
+    series = {
+        "history": read_model.history(conn, ids, longest),
+        "predictions": read_model.predictions(conn, ids, longest),
+        "rainfall": read_model.rainfall(conn, ids, longest),
+    }
+    conn.close()
+
+    for days in RANGES:
+        for name, df in series.items():
+            frames[f"{name}_{days}"] = read_model.for_chart(df, days)
+
+    version = read_model.write_snapshot(frames)
+    notify(CONN, "snapshot")
+    rows = sum(len(df) for df in frames.values())
+    logger.success(f"Published snapshot {version}: {len(frames)} frames, {rows} rows in {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    with profiled("publish_snapshot"):
+        main()
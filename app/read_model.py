@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+read_model.py – the dashboard's data, shaped once
+Queries return chart-ready frames (dashboard column names and Type labels) for
+many stations at once. The dashboard runs them live through its pool, and
+publish_snapshot.py writes them as Feather files after every collector cycle,
+so dashboard reruns read memory-mapped files instead of the database.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+
+import pandas as pd
+from pyarrow import feather
+
+from downsample import bucket_sum_by_station, downsample_by_station
+
+REAL_LABEL = "Measured Level"
+RANGES = [7, 14, 30, 60, 180, 365]  # the dashboard's "Graph history (days)" options
+SNAPSHOT_DIR = Path("/app/data/snapshot")
+MANIFEST = SNAPSHOT_DIR / "manifest.json"
+
+# === QUERIES ===
+def latest_readings(conn):
+    df = pd.read_sql_query("""
+        SELECT DISTINCT ON (station_id)
+        station_id, river, label, level, timestamp
+        FROM readings
+        ORDER BY station_id, timestamp DESC
+    """, conn)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+def history(conn, station_ids, days):
+    start = (datetime.now(UTC) - timedelta(days=days)).isoformat()
+    df = pd.read_sql_query("""
+        SELECT station_id, timestamp, level, good_level FROM readings
+        WHERE station_id = ANY(%s) AND timestamp >= %s
+        ORDER BY station_id, timestamp
+    """, conn, params=(list(station_ids), start))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.rename(columns={'timestamp': 'Date', 'level': 'Level (metres)'})
+    df['Type'] = REAL_LABEL
+    return df
+
+def predictions(conn, station_ids, days):
+    start = (datetime.now(UTC) - timedelta(days=days)).isoformat()
+    df = pd.read_sql_query("""
+        SELECT station_id, predicted_for, predicted_level FROM predictions
+        WHERE station_id = ANY(%s) AND predicted_for >= %s
+        ORDER BY station_id, predicted_for
+    """, conn, params=(list(station_ids), start))
+    df['predicted_for'] = pd.to_datetime(df['predicted_for'])
+    df = df.rename(columns={'predicted_for': 'Date', 'predicted_level': 'Level (metres)'})
+    df['Type'] = 'Predicted'
+    return df
+
+def rainfall(conn, station_ids, days):
+    start = (datetime.now(UTC) - timedelta(days=days)).isoformat()
+    df = pd.read_sql_query("""
+        SELECT level_station_id AS station_id, timestamp, rainfall_mm FROM rainfall_readings
+        WHERE level_station_id = ANY(%s) AND timestamp >= %s
+        ORDER BY level_station_id, timestamp
+    """, conn, params=(list(station_ids), start))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.rename(columns={'timestamp': 'Date', 'rainfall_mm': 'Rainfall (mm)'})
+    df['Type'] = 'Rainfall'
+    return df
+
+def gspot_forecast(conn):
+    try:
+        return pd.read_sql_query("""
+            SELECT station_id, window_start, window_end FROM gspot_forecast
+        """, conn)
+    except Exception:
+        conn.rollback()
+        return pd.DataFrame(columns=['station_id', 'window_start', 'window_end'])
+
+def for_chart(df, days=None):
+    """
+    Trim a series frame to the last `days` and cut each station to chart size:
+    levels by LTTB (G SPOT rows kept), rain summed into time buckets so totals survive.
+    """
+    if days is not None:
+        df = df[df['Date'] >= pd.Timestamp(datetime.now(UTC) - timedelta(days=days))]
+    if 'Rainfall (mm)' in df:
+        return bucket_sum_by_station(df, 'Rainfall (mm)')
+    keep = df['good_level'] == 'y' if 'good_level' in df else None
+    return downsample_by_station(df, 'Level (metres)', keep=keep)
+
+# === SNAPSHOT ===
+# Each publish goes to its own version directory; manifest.json is swapped in
+# last with os.replace, so readers never see a half-written snapshot.
+def write_snapshot(frames):
+    """frames: {name: DataFrame}. Returns the new version string."""
+    version = datetime.now(UTC).strftime("%Y%m%dT%H%M%S")
+    target = SNAPSHOT_DIR / version
+    target.mkdir(parents=True, exist_ok=True)
+    for name, df in frames.items():
+        # Uncompressed so readers can memory-map the columns without copying
+        feather.write_feather(df.reset_index(drop=True), target / f"{name}.feather", compression="uncompressed")
+
+    tmp = MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": version, "published_at": datetime.now(UTC).isoformat()}))
+    os.replace(tmp, MANIFEST)
+
+    # Keep the previous version for readers that are still mid-load
+    old = sorted(p for p in SNAPSHOT_DIR.iterdir() if p.is_dir() and p.name != version)
+    for path in old[:-1]:
+        shutil.rmtree(path, ignore_errors=True)
+    return version
+
+def snapshot_version(max_age=timedelta(minutes=45)):
+    """Current snapshot version, or None if there is none or the collector has stopped publishing."""
+    try:
+        manifest = json.loads(MANIFEST.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    if datetime.now(UTC) - datetime.fromisoformat(manifest["published_at"]) > max_age:
+        return None
+    return manifest["version"]
+
+def read_snapshot(name, version):
+    table = feather.read_table(SNAPSHOT_DIR / version / f"{name}.feather", memory_map=True)
+    return table.to_pandas()
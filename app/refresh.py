@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+refresh.py – tells dashboard sessions when there is something new to show
+Collector stages call notify() after they commit new data; each dashboard
+process runs one ChangeWatcher thread that LISTENs for it and keeps a
+counter per stage. Sessions compare counters instead of rerunning on a timer.
+"""
+import select
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from loguru import logger
+
+CHANNEL = "river_data"
+
+def notify(dsn, stage):
+    """Announce that `stage` (readings, predictions, gspot, snapshot, ...) committed new data."""
+    try:
+        conn = psycopg2.connect(dsn)
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, stage))
+        conn.close()
+    except psycopg2.Error as e:
+        logger.warning(f"Could not notify {CHANNEL}: {e}")
+
+class ChangeWatcher:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name="change-watcher", daemon=True).start()
+
+    def version(self, stages=None):
+        """Token that changes when any of `stages` (default: all) lands new data."""
+        with self._lock:
+            if stages is None:
+                return sum(self.counts.values())
+            # A reconnect counts for everyone: notifications may have been missed
+            return self.counts["reconnect"] + sum(self.counts[s] for s in stages)
+
+    def _bump(self, stage):
+        with self._lock:
+            self.counts[stage] += 1
+
+    def _run(self):
+        first = True
+        conn = None
+        while True:
+            try:
+                if conn is not None:
+                    conn.close()  # the dead LISTEN connection, before opening its replacement
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                if not first:
+                    self._bump("reconnect")
+                first = False
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._bump(conn.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                logger.warning(f"Change watcher lost the database, retrying: {e}")
+                time.sleep(10)
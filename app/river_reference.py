@@ -1,174 +1,146 @@
 #!/usr/bin/env python3
 """
-riverdipstick/stations.py
-Central reference loader – CSV + EA API coordinates.
+river_reference.py – station registry (stations.csv + coordinate cache)
+Loaded lazily on first use and memoized on the CSV / cache mtimes, like rules.py:
+importing this module reads nothing, calls no API and writes no files.
+Missing coordinates are only fetched from the EA API by an explicit
+fill_missing_coords() (python river_reference.py --fill-coords), and the cache
+is rewritten atomically, and only when something changed.
+
+    STATIONS              {river: [station, ...]} in CSV order (station dicts:
+                          id, river, label, lat, lon, rainfall_id)
+    get_registry()        StationRegistry with the indexes below
+      .by_id[sid]         station
+      .gauge[sid]         rainfall_id (or None)
+      .ordered(river)     stations source-to-sea
 """
-from pathlib import Path
 import csv
 import json
-import pathlib
+import os
 import sys
-from typing import Dict, List, Tuple
-
-import requests
-from loguru import logger
-
-# --------------------------------------------------------------------------- #
-# CONFIG – robust path handling
-# --------------------------------------------------------------------------- #
-# Project root = directory that contains the `riverdipstick` package
-PROJECT_ROOT = pathlib.Path(__file__).resolve().parent.parent
-DATA_DIR = PROJECT_ROOT / "data"
 from pathlib import Path
 
-# In Docker, data is mounted to /app/data
-CSV_PATH = Path("/app/data/stations.csv")
+from loguru import logger
 
-def load_stations():
-    with open(CSV_PATH, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        stations = {}
-        for row in reader:
-            station_id = row['Station ID']
-            stations[station_id] = {
-                'river': row['River'],
-                'label': row['Label'],
-                'lat': float(row['Latitude']),
-                'lon': float(row['Longitude']),
-            }
-        return stations
+DATA_DIR = Path("/app/data")
+CSV_PATH = DATA_DIR / "stations.csv"
 CACHE_PATH = DATA_DIR / "station_coords_cache.json"
+# Every EA call goes through this base, so the collector and backfills can be
+# pointed at a local stand-in (benchmarks/mock_ea.py) for offline testing
+EA_API_BASE = os.getenv("EA_API_BASE", "https://environment.data.gov.uk/flood-monitoring").rstrip("/")
+EA_STATION_URL = EA_API_BASE + "/id/stations/{}.json"
+
+# Rivers listed here run south → north, so source-to-sea is ascending latitude;
+# the rest reach the sea further south than they rise.
+NORTHWARD_RIVERS = {"Eden"}
+
+class StationRegistry:
+    def __init__(self, stations):
+        self.by_id = {s['id']: s for s in stations}
+        self.by_river = {}
+        for s in stations:
+            self.by_river.setdefault(s['river'], []).append(s)
+        self.gauge = {s['id']: s['rainfall_id'] for s in stations}
+
+    def ordered(self, river):
+        """Stations of a river from source to sea."""
+        stations = self.by_river.get(river, [])
+        return sorted(stations, key=lambda x: x.get('lat') or 0, reverse=river not in NORTHWARD_RIVERS)
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-# Ensure data folder exists
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-# --------------------------------------------------------------------------- #
-# DEFAULT CSV (created on first run if missing)
-# --------------------------------------------------------------------------- #
-DEFAULT_CSV_CONTENT = """river,station_id,label,lat,lon
-Eden,760101,Kirkby Stephen,,
-Eden,760112,Great Musgrave Bridge,,
-Eden,760115,Appleby,,
-Eden,760502,Temple Sowerby,,
-Eden,762505,Great Corby,,
-Eden,765512,Sheepmount,,
-Eden,762540,Linstock,,
-Ribble,710151,Locks Weir,,
-Ribble,710102,Penny Bridge,,
-Ribble,710301,Low Moor,,
-Ribble,710305,Henthorn,,
-Ribble,713056,New Jumbles Rock,,
-Ribble,713040,Ribchester School,,
-River Lune,724735,Lancaster Quay,54.051851,-2.822021
-River Lune,724629,Caton,54.081344,-2.722026
-River Lune,722242,Lunes Bridge,54.420034,-2.599286
-River Lune,722421,Killington,54.310113,-2.582471
-River Lune,724647,Skerton Weir,54.063594,-2.791879
-"""
-
-# --------------------------------------------------------------------------- #
-# INTERNAL CACHE
-# --------------------------------------------------------------------------- #
-def _load_cache() -> Dict[str, Tuple[float, float]]:
+def _read_cache():
     if CACHE_PATH.exists():
-        return json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+        return {sid: tuple(c) for sid, c in json.loads(CACHE_PATH.read_text(encoding="utf-8")).items()}
     return {}
 
-def _save_cache(cache: Dict[str, Tuple[float, float]]):
-    CACHE_PATH.write_text(json.dumps(cache, indent=2), encoding="utf-8")
-
-# --------------------------------------------------------------------------- #
-# CORE LOADER
-# --------------------------------------------------------------------------- #
-def load_stations():
-    import csv
-    import json
-    import os
-    from loguru import logger
-
-    CSV_PATH = "/app/data/stations.csv"
-    CACHE_PATH = "/app/data/station_coords_cache.json"
-
-    STATIONS = {}
-
-    # Load cache
-    cache = {}
-    if os.path.exists(CACHE_PATH):
-        with open(CACHE_PATH, 'r') as f:
-            cache = json.load(f)
+def _write_cache(cache):
+    tmp = CACHE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    os.replace(tmp, CACHE_PATH)
 
+def _read_stations(cache):
+    stations = []
     with open(CSV_PATH, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            river = row["river"].strip()
+        for row in csv.DictReader(csvfile):
             sid = row["station_id"].strip()
-            label = row["label"].strip()
-            lat = row["lat"].strip()
-            lon = row["lon"].strip()
-            rainfall_id = row.get("rainfall_id", "").strip() or None  # ← CRITICAL LINE
-
-            # Use CSV lat/lon if available
+            lat, lon = row["lat"].strip(), row["lon"].strip()
             if lat and lon:
                 lat, lon = float(lat), float(lon)
-                cache[sid] = (lat, lon)
-                logger.debug(f"CSV hit for {sid} → {lat},{lon}")
+            elif sid in cache:
+                lat, lon = cache[sid]
             else:
-                # Fallback to cache or API
-                if sid in cache:
-                    lat, lon = cache[sid]
-                    logger.debug(f"Cache hit for {sid} → {lat},{lon}")
-                else:
-                    lat, lon = fetch_coordinates_from_ea(sid)
-                    if lat and lon:
-                        cache[sid] = (lat, lon)
-                        logger.debug(f"API hit for {sid} → {lat},{lon}")
-                    else:
-                        lat, lon = None, None
-                        logger.warning(f"No coordinates for {sid}")
-
-            if river not in STATIONS:
-                STATIONS[river] = []
-            STATIONS[river].append({
+                lat, lon = None, None
+            stations.append({
                 "id": sid,
-                "label": label,
+                "river": row["river"].strip(),
+                "label": row["label"].strip(),
                 "lat": lat,
                 "lon": lon,
-                "rainfall_id": rainfall_id  # ← NOW INCLUDED
+                "rainfall_id": row.get("rainfall_id", "").strip() or None,
             })
+    return stations
+
+_cache = {"key": None, "registry": None}
 
-    # Save updated cache
-    with open(CACHE_PATH, 'w') as f:
-        json.dump(cache, f, indent=2)
+def get_registry():
+    """Registry for the current stations.csv / coordinate cache; re-read only when either changes."""
+    key = (_mtime(CSV_PATH), _mtime(CACHE_PATH))
+    if key != _cache["key"]:
+        stations = _read_stations(_read_cache())
+        missing = [s['id'] for s in stations if s['lat'] is None]
+        if missing:
+            logger.warning(f"No coordinates for {missing} — run river_reference.py --fill-coords")
+        _cache.update(key=key, registry=StationRegistry(stations))
+    return _cache["registry"]
 
-    return STATIONS
+def load_stations():
+    """{river: [station, ...]} in CSV order."""
+    return get_registry().by_river
 
+def __getattr__(name):
+    # `from river_reference import STATIONS` loads the registry on first use, not at import
+    if name == "STATIONS":
+        return load_stations()
+    raise AttributeError(name)
 
-def _fetch_coords_from_ea(station_id: str) -> Tuple[float | None, float | None]:
+def _fetch_coords_from_ea(station_id):
     """Pull lat/lon from EA flood-monitoring API."""
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_id}.json"
+    import requests  # only needed for --fill-coords; keeps plain imports light
     try:
-        resp = requests.get(url, timeout=10)
+        resp = requests.get(EA_STATION_URL.format(station_id), timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-        items = data.get("items", {})
-        lat = items.get("lat")
-        lon = items.get("long")
+        items = resp.json().get("items", {})
+        lat, lon = items.get("lat"), items.get("long")
         if lat is not None and lon is not None:
             logger.info("Fetched {} → {},{}", station_id, lat, lon)
             return float(lat), float(lon)
         logger.warning("EA returned no lat/long for {}", station_id)
-        return None, None
     except Exception as exc:
         logger.error("EA API error for {}: {}", station_id, exc)
-        return None, None
-
+    return None, None
+
+def fill_missing_coords():
+    """Fetch coordinates for stations that have none; rewrite the cache only if any were found."""
+    cache = _read_cache()
+    found = 0
+    for s in get_registry().by_id.values():
+        if s['lat'] is None:
+            lat, lon = _fetch_coords_from_ea(s['id'])
+            if lat is not None:
+                cache[s['id']] = (lat, lon)
+                found += 1
+    if found:
+        _write_cache(cache)
+    return found
 
-# --------------------------------------------------------------------------- #
-# QUICK TEST
-# --------------------------------------------------------------------------- #
 if __name__ == "__main__":
-    import pprint
-    pprint.pprint(load_stations())
-    sys.exit(0)
-# === AUTO-LOAD STATIONS FOR IMPORT ===
-STATIONS = load_stations()
\ No newline at end of file
+    if "--fill-coords" in sys.argv:
+        print(f"Filled coordinates for {fill_missing_coords()} stations")
+    else:
+        import pprint
+        pprint.pprint(load_stations())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+rules.py – one G SPOT rules engine for collector, updater, backfills and dashboard
+rules.json is compiled once per file version into a StationRule per station and
+reloaded automatically when its mtime changes.
+
+good_fishing keys (only the band is required):
+    falling_start, falling_end   band, metres (end <= level <= start)
+    falling_window_hours         trailing window for the falling test (2)
+    min_points                   readings needed in the window (4)
+    max_rises                    rises allowed in the window (1)
+    rise_tolerance               smallest change that counts as a rise, m (0.001)
+    max_fall_rate                optional: fastest acceptable fall over the window, m/h
+    rain_window_days             optional: enables the rain test ...
+    rain_threshold               ... at least this much rain (mm) in that window
+rain_threshold on its own is kept in rules.json but not applied – the rain test
+was dropped from the live rules and comes back by adding rain_window_days.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from gspot import falling_mask, trailing_sum
+
+RULES_PATH = Path("/app/data/rules.json")
+if not RULES_PATH.exists():
+    RULES_PATH = Path("/home/river_levels_app/rules.json")
+
+class StationRule:
+    def __init__(self, cfg):
+        self.falling_start = float(cfg["falling_start"])
+        self.falling_end = float(cfg["falling_end"])
+        self.window = pd.Timedelta(hours=float(cfg.get("falling_window_hours", 2)))
+        self.min_points = int(cfg.get("min_points", 4))
+        self.max_rises = int(cfg.get("max_rises", 1))
+        self.rise_tolerance = float(cfg.get("rise_tolerance", 0.001))
+        self.max_fall_rate = cfg.get("max_fall_rate")
+        self.rain_window = pd.Timedelta(days=float(cfg["rain_window_days"])) if "rain_window_days" in cfg else None
+        self.rain_threshold = float(cfg.get("rain_threshold", 0))
+
+    @property
+    def needs_rain(self):
+        return self.rain_window is not None
+
+    def lead_in(self):
+        """History needed before the first reading being evaluated."""
+        return max(self.window, self.rain_window or pd.Timedelta(0))
+
+    def rain_totals(self, ts, rain_ts, rain_mm):
+        """Rain in the trailing rain window at each reading time."""
+        return trailing_sum(ts, rain_ts, rain_mm, self.rain_window)
+
+    def evaluate(self, ts, levels, rain_total=None):
+        """
+        Boolean G SPOT mask for a sorted level series.
+        rain_total: trailing rain per reading (array or scalar); required when needs_rain.
+        """
+        ts = np.asarray(ts, dtype='datetime64[ns]')
+        levels = np.asarray(levels, dtype=float)
+        ok = (levels >= self.falling_end) & (levels <= self.falling_start)
+        ok &= falling_mask(ts, levels, self.window, self.min_points, self.max_rises, self.rise_tolerance)
+
+        if self.max_fall_rate is not None:
+            start = np.searchsorted(ts, ts - np.timedelta64(self.window), side='left')
+            hours = (ts - ts[start]) / np.timedelta64(1, 'h')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.where(hours > 0, (levels[start] - levels) / hours, 0.0)
+            ok &= rate <= float(self.max_fall_rate)
+
+        if self.needs_rain:
+            if rain_total is None:
+                raise ValueError("rule needs rain totals")
+            ok &= np.asarray(rain_total, dtype=float) >= self.rain_threshold
+        return ok
+
+_cache = {"mtime": None, "rules": {}}
+
+def get_rules():
+    """Compiled rules by station ID; re-read only when rules.json changes."""
+    try:
+        mtime = RULES_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        if _cache["mtime"] is None:
+            logger.error(f"No rules file at {RULES_PATH}")
+        return _cache["rules"]
+    if mtime != _cache["mtime"]:
+        try:
+            raw = json.loads(RULES_PATH.read_text())
+            compiled = {sid: StationRule(r["good_fishing"]) for sid, r in raw.items() if r.get("good_fishing")}
+        except Exception as e:
+            # Keep serving the last good rules while the file is mid-edit
+            logger.error(f"Failed to load rules.json: {e}")
+            return _cache["rules"]
+        _cache.update(mtime=mtime, rules=compiled)
+        logger.info(f"Loaded G SPOT rules for {len(compiled)} stations")
+    return _cache["rules"]
+
+def rule_for(station_id):
+    return get_rules().get(station_id)
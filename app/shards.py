@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+shards.py – several collector containers side by side, each taking a slice
+Every collector sets COLLECTOR_WORKER (a name, or "hostname" for scaled
+replicas). Each run heartbeats into collector_workers; the workers seen within
+the last COLLECTOR_LEASE_MINUTES form a consistent-hash ring (VNODES points
+each) and a worker only takes the stations that hash to it. A worker that
+stops heartbeating drops out of the ring when its lease runs out and its
+stations move to the others; adding one moves only ~1/N of the stations.
+
+Per-station work also runs under a Postgres advisory lock, so two workers that
+briefly disagree about the ring never work on the same station at once (a
+station skipped during a handover is caught by the next run's gap backfill).
+Whole-network steps (areal rain, G SPOT forecast, snapshot) run on the leader
+only: the first live worker by name.
+
+Without COLLECTOR_WORKER nothing changes: one worker, every station, no locks.
+The same happens when the database cannot be reached, so an outage never
+stops collection (readings go to the spool instead).
+
+    shard = Shard(CONNECTION_STRING, "get_readings")
+    for station in shard.claimed(stations, key=lambda s: s['id']):
+        ...
+    shard.close()
+"""
+import bisect
+import hashlib
+import os
+import re
+import socket
+import time
+import zlib
+
+import psycopg2
+from loguru import logger
+
+WORKER = os.getenv("COLLECTOR_WORKER") or None
+if WORKER == "hostname":
+    WORKER = socket.gethostname()
+LEASE_MINUTES = float(os.getenv("COLLECTOR_LEASE_MINUTES", "30"))  # two 15-min cycles
+HEARTBEAT_EVERY = 60  # seconds, while a long stage is running
+VNODES = 64
+
+def tagged(name):
+    """`name` made unique to this worker, for files on the shared data volume (metrics, profiles)."""
+    if not WORKER:
+        return name
+    return name + "-" + re.sub(r"[^\w.-]", "_", WORKER)
+
+def _hash(text):
+    return int(hashlib.md5(text.encode()).hexdigest()[:16], 16)
+
+def _int4(text):
+    # advisory lock keys are signed 32-bit pairs
+    return zlib.crc32(text.encode()) - 2 ** 31
+
+class Ring:
+    def __init__(self, workers, vnodes=VNODES):
+        points = sorted((_hash(f"{w}#{i}"), w) for w in workers for i in range(vnodes))
+        self._points = [p for p, _ in points]
+        self._workers = [w for _, w in points]
+
+    def owner(self, key):
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._workers[i]
+
+class Shard:
+    def __init__(self, dsn, stage, worker=WORKER, connect_timeout=None):
+        self.stage = stage
+        self.worker = worker
+        self.workers = [worker]
+        self.conn = None
+        if worker:
+            try:
+                self.conn = psycopg2.connect(dsn, connect_timeout=connect_timeout)
+                self.conn.autocommit = True
+                self._init_table()
+                self._heartbeat()
+                self.workers = self._live()
+                logger.info(f"Worker {worker} of {len(self.workers)} ({', '.join(self.workers)}) for {stage}")
+            except psycopg2.OperationalError as e:
+                # No ring without the database: take everything, unlocked, rather than nothing
+                logger.warning(f"{stage}: cannot reach the worker table, running unsharded: {e}")
+                self._unshard()
+        self.ring = Ring(self.workers)
+
+    def _unshard(self):
+        self.close()
+        self.conn = None
+        self.worker = None
+        self.workers = [None]
+
+    def _init_table(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS collector_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    stage TEXT,
+                    heartbeat TIMESTAMPTZ NOT NULL
+                )
+            """)
+
+    def _heartbeat(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO collector_workers (worker_id, stage, heartbeat) VALUES (%s, %s, NOW())
+                ON CONFLICT (worker_id) DO UPDATE SET stage = EXCLUDED.stage, heartbeat = NOW()
+            """, (self.worker, self.stage))
+        self._beat = time.monotonic()
+
+    def _live(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT worker_id FROM collector_workers
+                WHERE heartbeat > NOW() - make_interval(secs => %s)
+                ORDER BY worker_id
+            """, (LEASE_MINUTES * 60,))
+            return [w for (w,) in cur.fetchall()]
+
+    @property
+    def leader(self):
+        return self.worker is None or self.workers[0] == self.worker
+
+    def owns(self, key):
+        return self.worker is None or self.ring.owner(key) == self.worker
+
+    def claimed(self, items, key=lambda item: item):
+        """The items this worker owns, each yielded while its advisory lock is held."""
+        for item in items:
+            k = key(item)
+            if not self.owns(k):
+                continue
+            if self.conn is None:
+                yield item
+                continue
+            try:
+                if time.monotonic() - self._beat > HEARTBEAT_EVERY:
+                    self._heartbeat()
+                with self.conn.cursor() as cur:
+                    cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (_int4(self.stage), _int4(k)))
+                    locked = cur.fetchone()[0]
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # Locks died with the connection; finish the run on what we own
+                logger.warning(f"{self.stage}: lost the database mid-run, continuing without locks: {e}")
+                self.conn.close()
+                self.conn = None
+                yield item
+                continue
+            if not locked:
+                logger.info(f"{k} is being worked on by another collector — skipping")
+                continue
+            try:
+                yield item
+            finally:
+                try:
+                    with self.conn.cursor() as cur:
+                        cur.execute("SELECT pg_advisory_unlock(%s, %s)", (_int4(self.stage), _int4(k)))
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    pass  # a dropped connection releases its locks anyway
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+def is_leader(dsn, stage):
+    """True when this worker should run a whole-network stage (always, when unsharded)."""
+    shard = Shard(dsn, stage)
+    shard.close()
+    if not shard.leader:
+        logger.info(f"{stage}: {shard.workers[0]} is the leader — skipping")
+    return shard.leader
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+spool.py – local append-only spool for rows the database would not take
+When Postgres is down or too slow to connect, the collector hands its rows to
+a Spool instead of dropping them. Rows are JSON lines ({"table": ..., "row": [...]})
+buffered per station and written with one fsync per flush(). The next run
+replays the spool before collecting: the file is first renamed aside, so
+anything spooled during the replay lands in a fresh file, and is then inserted
+in file order in bulk with ON CONFLICT DO NOTHING, so a replay interrupted
+halfway can simply run again. A torn last line from a crash is skipped.
+Collector replicas share the spool directory: appends and the whole replay
+(rename, read, insert, remove) hold an flock on <name>.lock, so one worker
+never removes a file another has renamed aside; a worker that finds the
+replay already running leaves it to that worker.
+
+    spool = Spool("get_readings")
+    spool.add("readings", (sid, river, label, level, ts)); spool.flush()
+    replay(CONNECTION_STRING, "get_readings", {"readings": "INSERT INTO readings (...) VALUES %s ON CONFLICT DO NOTHING"})
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_values
+from loguru import logger
+
+SPOOL_DIR = Path(os.getenv("SPOOL_DIR", "/app/data/spool"))
+REPLAY_PAGE = 1000
+
+@contextmanager
+def _locked(name, wait=True):
+    """Exclusive flock on the spool's lock file; yields False if busy and wait is off."""
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    with open(SPOOL_DIR / f"{name}.lock", "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class Spool:
+    def __init__(self, name):
+        self.name = name
+        self.path = SPOOL_DIR / f"{name}.jsonl"
+        self._pending = []
+
+    def add(self, table, row):
+        self._pending.append(json.dumps({"table": table, "row": list(row)}))
+
+    def flush(self):
+        """Append everything added since the last flush and fsync it."""
+        if not self._pending:
+            return 0
+        with _locked(self.name), open(self.path, "a+b") as f:
+            # A crash mid-write leaves a torn last line; start on a fresh one
+            torn = False
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            f.write((("\n" if torn else "") + "\n".join(self._pending) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        n, self._pending = len(self._pending), []
+        logger.warning(f"Spooled {n} rows to {self.path}")
+        return n
+
+def _read(path):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                rows.append((entry["table"], tuple(entry["row"])))
+            except (ValueError, KeyError):
+                logger.warning(f"Skipping unreadable spool line in {path}: {line[:80]!r}")
+    return rows
+
+def _replay_file(dsn, path, inserts, connect_timeout):
+    """Rows newly inserted from one spool file, or None if it could not be replayed (file kept)."""
+    try:
+        rows = _read(path)
+    except FileNotFoundError:
+        return 0  # already replayed and removed
+    try:
+        conn = psycopg2.connect(dsn, connect_timeout=connect_timeout)
+    except psycopg2.OperationalError as e:
+        logger.warning(f"Database still unavailable, {len(rows)} spooled rows kept: {e}")
+        return None
+    inserted = 0
+    try:
+        with conn.cursor() as cur:
+            # Runs of one table go in together, so file order is kept
+            start = 0
+            while start < len(rows):
+                table = rows[start][0]
+                end = start
+                while end < len(rows) and rows[end][0] == table and end - start < REPLAY_PAGE:
+                    end += 1
+                if table in inserts:
+                    batch = [row for _, row in rows[start:end]]
+                    execute_values(cur, inserts[table], batch, page_size=len(batch))
+                    inserted += max(cur.rowcount, 0)
+                else:
+                    logger.error(f"No insert for spooled table {table!r} — {end - start} rows dropped")
+                start = end
+        conn.commit()
+    except psycopg2.Error as e:
+        if not conn.closed:
+            conn.rollback()
+        logger.error(f"Spool replay of {path} failed, kept for the next run: {e}")
+        return None
+    finally:
+        conn.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    logger.success(f"Replayed {len(rows)} spooled rows from {path.name}, {inserted} new")
+    return inserted
+
+def replay(dsn, name, inserts, connect_timeout=10):
+    """
+    Insert spooled rows for `name` (inserts: {table: INSERT ... VALUES %s ON CONFLICT DO NOTHING}).
+    Returns the rows that were new; anything that could not be replayed stays spooled.
+    """
+    live = SPOOL_DIR / f"{name}.jsonl"
+    aside = SPOOL_DIR / f"{name}.replaying.jsonl"
+    if not (live.exists() or aside.exists()):
+        return 0
+    total = 0
+    with _locked(name, wait=False) as held:
+        if not held:
+            logger.info(f"Spool {name} is being replayed by another worker")
+            return 0
+        while live.exists() or aside.exists():
+            if not aside.exists():
+                os.replace(live, aside)
+            inserted = _replay_file(dsn, aside, inserts, connect_timeout)
+            if inserted is None:
+                break
+            total += inserted
+    return total
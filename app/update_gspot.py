@@ -3,91 +3,86 @@
 update_gspot.py – Incremental update for good_level flags.
 Rain threshold removed – g-spot = falling + in band only
 Relaxed falling detection: allow at most 1 small rise (≤0.01m) in ~2h window
+Vectorized: one fetch + one bulk UPDATE per station (rules compiled in rules.py)
 """
 import psycopg2
+import pandas as pd
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import json
-from pathlib import Path
 from loguru import logger
 from dotenv import load_dotenv
+from gspot import rain_totals_for, write_flags
+from rules import get_rules, rule_for
+from refresh import notify
+import metrics
+from profiling import profiled
+from shards import Shard
 import os
 
 load_dotenv()
 DB_PASS = os.getenv("DB_PASSWORD")
 CONN = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
-RULES_PATH = Path("/app/data/rules.json")
-if not RULES_PATH.exists():
-    RULES_PATH = Path("/home/river_levels_app/rules.json")
-RULES = json.loads(RULES_PATH.read_text())
 UTC = ZoneInfo("UTC")
 
 # Log to file for easy checking
 logger.add("/opt/river-dipstick/gspot_update.log", rotation="10 MB", level="INFO")
 
-def update_station(station_id):
-    conn = psycopg2.connect(CONN)
-    cur = conn.cursor()
-
-    # Look back 2 days – buffer for falling check
-    since_dt = datetime.now(UTC) - timedelta(days=2)
-    cur.execute("""
-        SELECT timestamp, level
-        FROM readings
-        WHERE station_id = %s AND timestamp >= %s AND good_level = 'n'
-        ORDER BY timestamp
-    """, (station_id, since_dt))
-    rows = cur.fetchall()
-
-    if not rows:
-        logger.info(f"No pending readings for {station_id}")
-        conn.close()
-        return
-
-    logger.info(f"Updating G SPOT for {station_id} — {len(rows)} pending readings")
-    cfg = RULES.get(station_id, {}).get("good_fishing")
-    if not cfg:
+def update_station(station_id, conn=None):
+    rule = rule_for(station_id)
+    if not rule:
         logger.warning(f"No rules for {station_id}")
-        conn.close()
-        return
+        return 0
 
-    start_lvl = cfg["falling_start"]
-    end_lvl = cfg["falling_end"]
-    gspot_count = 0
-
-    for ts_tz, level in rows:
-        two_h_ago = ts_tz - timedelta(hours=2)
+    own_conn = conn is None
+    if own_conn:
+        conn = psycopg2.connect(CONN)
+    cur = conn.cursor()
 
-        # 1. Falling? (allow at most 1 small rise ≤0.01m)
+    # One fetch: the last 2 days plus one falling window of lead-in
+    # (plus one rain fetch for rules that have a rain test)
+    since_dt = datetime.now(UTC) - timedelta(days=2)
+    with metrics.timer("dipstick_db_seconds", op="fetch_readings"):
         cur.execute("""
-            SELECT level FROM readings
-            WHERE station_id = %s AND timestamp >= %s AND timestamp <= %s
+            SELECT timestamp, level, good_level
+            FROM readings
+            WHERE station_id = %s AND timestamp >= %s AND level IS NOT NULL
             ORDER BY timestamp
-        """, (station_id, two_h_ago, ts_tz))
-        recent = [r[0] for r in cur.fetchall()]
-        if len(recent) >= 4:
-            rises = sum(1 for i in range(len(recent)-1) if recent[i] < recent[i+1] - 0.001)
-            falling = rises <= 1
-        else:
-            falling = False
+        """, (station_id, since_dt - rule.window))
+        rows = cur.fetchall()
 
-        # 2. In band?
-        in_band = end_lvl <= level <= start_lvl
+    df = pd.DataFrame(rows, columns=["raw_ts", "level", "good_level"])
+    df["ts"] = pd.to_datetime(df["raw_ts"], utc=True, format="ISO8601")
+    df = df.sort_values("ts", kind="stable")
+    pending = (df["good_level"] == 'n') & (df["ts"] >= since_dt)
 
-        flag = 'y' if (falling and in_band) else 'n'
-        if flag == 'y':
-            gspot_count += 1
+    if not pending.any():
+        logger.info(f"No pending readings for {station_id}")
+        if own_conn:
+            conn.close()
+        return 0
 
-        cur.execute("""
-            UPDATE readings SET good_level = %s
-            WHERE station_id = %s AND timestamp = %s
-        """, (flag, station_id, ts_tz))
+    logger.info(f"Updating G SPOT for {station_id} — {int(pending.sum())} pending readings")
+    rain_total = rain_totals_for(cur, station_id, rule, df["ts"])
+    hits = pending & rule.evaluate(df["ts"], df["level"], rain_total)
 
-    conn.commit()
-    conn.close()
+    # Pending rows are already 'n', so only the new hits need writing
+    with metrics.timer("dipstick_db_seconds", op="write_flags"):
+        gspot_count = write_flags(cur, station_id, df.loc[hits, "raw_ts"], ['y'] * int(hits.sum()))
+        conn.commit()
+    metrics.inc("dipstick_gspot_hits_total", gspot_count, station=station_id)
+    if own_conn:
+        conn.close()
     logger.success(f"Finished {station_id} → {gspot_count} new G SPOT hits")
+    return gspot_count
 
 if __name__ == "__main__":
-    for sid in RULES.keys():
-        update_station(sid)
-    print("Incremental G SPOT update complete!")
\ No newline at end of file
+    with profiled("update_gspot"):
+        conn = psycopg2.connect(CONN)
+        shard = Shard(CONN, "update_gspot")
+        new_hits = sum(update_station(sid, conn) for sid in shard.claimed(get_rules()))
+        shard.close()
+        conn.close()
+        if new_hits:
+            notify(CONN, "gspot")
+        metrics.write("update_gspot")
+        print("Incremental G SPOT update complete!")
@@ -1,77 +1,113 @@
 #!/usr/bin/env python3
 """
-FINAL backfill_gspot.py – robust version
+FINAL backfill_gspot.py – parallel, chunked full recompute
 Rain removed
 Falling relaxed: allow 1 small rise (≤0.01m) in ~2h window
-Full recompute every row
+Any stations, any date range: the range is split into time chunks (each
+fetched with 2h of lead-in for the falling window), chunks run in worker
+processes with the compiled rules from rules.py, and only flags that
+changed are written back – one UPDATE per chunk.
+
+    python /app/utility/backfill_gspot.py                          # all ruled stations, last 30 days
+    python /app/utility/backfill_gspot.py --stations 760112 --start 2025-01-01 --end 2026-01-01
 """
-import psycopg2
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import json
-from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg2
 from loguru import logger
 from dotenv import load_dotenv
-import os
+
+# Add /app to path for shared imports
+sys.path.append("/app")
+from gspot import rain_totals_for, write_flags
+from profiling import profiled
+from rules import get_rules
 
 load_dotenv()
 DB_PASS = os.getenv("DB_PASSWORD")
 CONN = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
-RULES_PATH = Path("/app/data/rules.json")
-if not RULES_PATH.exists():
-    RULES_PATH = Path("/home/river_levels_app/rules.json")
-RULES = json.loads(RULES_PATH.read_text())
 UTC = ZoneInfo("UTC")
 
-def recompute_station(station_id):
+def recompute_chunk(station_id, rule, start, end):
+    """Recompute flags for readings in [start, end); returns (readings, hits, changed)."""
     conn = psycopg2.connect(CONN)
     cur = conn.cursor()
-    since_dt = datetime.now(UTC) - timedelta(days=30)
     cur.execute("""
-        SELECT timestamp, level
+        SELECT timestamp, level, good_level
         FROM readings
-        WHERE station_id = %s AND timestamp >= %s
+        WHERE station_id = %s AND timestamp >= %s AND timestamp < %s AND level IS NOT NULL
         ORDER BY timestamp
-    """, (station_id, since_dt))
-    rows = cur.fetchall()
-    logger.info(f"Recomputing G SPOT for {station_id} — {len(rows)} readings")
-    cfg = RULES.get(station_id, {}).get("good_fishing")
-    if not cfg:
-        logger.warning(f"No rules for {station_id}")
+    """, (station_id, start - rule.window, end))
+    df = pd.DataFrame(cur.fetchall(), columns=["raw_ts", "level", "good_level"])
+    if df.empty:
         conn.close()
-        return
-    start_lvl = cfg["falling_start"]
-    end_lvl = cfg["falling_end"]
-    gspot_count = 0
-    for ts_tz, level in rows:
-        two_h_ago = ts_tz - timedelta(hours=2)
-        # 1. Falling? (allow 1 small rise ≤0.01m)
-        cur.execute("""
-            SELECT level FROM readings
-            WHERE station_id = %s AND timestamp >= %s AND timestamp <= %s
-            ORDER BY timestamp
-        """, (station_id, two_h_ago, ts_tz))
-        recent = [r[0] for r in cur.fetchall()]
-        if len(recent) >= 4:
-            rises = sum(1 for i in range(len(recent)-1) if recent[i] < recent[i+1] - 0.001)  # count real rises
-            falling = rises <= 1  # allow at most 1 small fluctuation
-        else:
-            falling = False
-        # 2. In band?
-        in_band = end_lvl <= level <= start_lvl
-        flag = 'y' if (falling and in_band) else 'n'
-        if flag == 'y':
-            gspot_count += 1
-        cur.execute("""
-            UPDATE readings SET good_level = %s
-            WHERE station_id = %s AND timestamp = %s
-        """, (flag, station_id, ts_tz))
+        return 0, 0, 0
+
+    df["ts"] = pd.to_datetime(df["raw_ts"], utc=True, format="ISO8601")
+    df = df.sort_values("ts", kind="stable")
+    rain_total = rain_totals_for(cur, station_id, rule, df["ts"])
+    flags = pd.Series(np.where(rule.evaluate(df["ts"], df["level"], rain_total), 'y', 'n'), index=df.index)
+
+    # The lead-in rows only feed the window; they belong to the previous chunk
+    own = df["ts"] >= start
+    changed = own & (flags != df["good_level"])
+    write_flags(cur, station_id, df.loc[changed, "raw_ts"], flags[changed])
     conn.commit()
     conn.close()
-    logger.success(f"Finished {station_id} → {gspot_count} G SPOT hits")
+    return int(own.sum()), int((own & (flags == 'y')).sum()), int(changed.sum())
+
+def chunks(start, end, size):
+    while start < end:
+        yield start, min(start + size, end)
+        start += size
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute good_level flags from rules.json")
+    parser.add_argument("--stations", nargs="*", help="station IDs (default: every station in rules.json)")
+    parser.add_argument("--start", help="YYYY-MM-DD, UTC (default: 30 days ago)")
+    parser.add_argument("--end", help="YYYY-MM-DD, UTC, exclusive (default: now)")
+    parser.add_argument("--chunk-days", type=float, default=7)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    end = datetime.fromisoformat(args.end).replace(tzinfo=UTC) if args.end else datetime.now(UTC)
+    start = datetime.fromisoformat(args.start).replace(tzinfo=UTC) if args.start else end - timedelta(days=30)
+    size = timedelta(days=args.chunk_days)
+
+    rules = get_rules()
+    jobs = []
+    for sid in args.stations or list(rules):
+        rule = rules.get(sid)
+        if not rule:
+            logger.warning(f"No rules for {sid}")
+            continue
+        jobs += [(sid, rule, c0, c1) for c0, c1 in chunks(start, end, size)]
+
+    logger.info(f"Recomputing G SPOT {start:%Y-%m-%d} → {end:%Y-%m-%d}: {len(jobs)} chunks, {args.workers} workers")
+    t0 = time.perf_counter()
+    totals = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(recompute_chunk, *job): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            sid = futures[fut]
+            n, hits, changed = fut.result()
+            t = totals.setdefault(sid, [0, 0, 0])
+            t[0] += n
+            t[1] += hits
+            t[2] += changed
+
+    for sid, (n, hits, changed) in sorted(totals.items()):
+        logger.success(f"Finished {sid} → {hits} G SPOT hits in {n} readings ({changed} flags changed)")
+    print(f"\nBackfill complete in {time.perf_counter() - t0:.1f}s! Green dots await you.")
 
 if __name__ == "__main__":
-    for sid in ["713040", "710301", "760112", "760101", "760115", "710151", "711610"]:
-        if sid in RULES:
-            recompute_station(sid)
-    print("\nBackfill complete! Green dots await you.")
\ No newline at end of file
+    with profiled("backfill_gspot"):
+        main()
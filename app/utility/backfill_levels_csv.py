@@ -10,7 +10,8 @@ from datetime import datetime, timedelta, UTC
 import psycopg2
 import time
 import sys
-from river_reference import STATIONS
+from river_reference import STATIONS, EA_API_BASE
+from profiling import profiled
 from dotenv import load_dotenv
 import os
 
@@ -18,7 +19,7 @@ load_dotenv()
 DB_PASS = os.getenv("DB_PASSWORD")
 CONNECTION_STRING = f'postgresql://river_user:{DB_PASS}@db:5432/river_levels_db'
 
-CSV_URL_TEMPLATE = "https://environment.data.gov.uk/flood-monitoring/archive/readings-full-{date}.csv"
+CSV_URL_TEMPLATE = EA_API_BASE + "/archive/readings-full-{date}.csv"
 DAYS_BACK = 365
 
 def get_missing_dates(conn):
@@ -39,6 +40,23 @@ def get_missing_dates(conn):
     cur.close()
     return dates
 
+def parse_archive(lines, stations):
+    """(stationReference, level, dateTime) for each level reading of `stations` in readings-full CSV lines."""
+    for row in csv.DictReader(lines):
+        ref = row.get('stationReference', '').strip()
+        if ref not in stations:
+            continue
+        if 'level' not in row.get('measure', '').lower():
+            continue
+        try:
+            level = float(row.get('value', '').strip())
+        except ValueError:
+            continue
+        ts = row.get('dateTime', '').strip()
+        if not ts:
+            continue
+        yield ref, level, ts
+
 def insert_reading(cur, station_id, river, label, level, timestamp_str):
     ts = timestamp_str.replace('Z', '+00')
     cur.execute("""
@@ -80,24 +98,8 @@ def main():
                     break
 
                 daily = 0
-                reader = csv.DictReader(
-                    line.decode('utf-8', errors='ignore')
-                    for line in response.iter_lines() if line
-                )
-                for row in reader:
-                    ref = row.get('stationReference', '').strip()
-                    if ref not in all_stations:
-                        continue
-                    if 'level' not in row.get('measure', '').lower():
-                        continue
-                    try:
-                        level = float(row.get('value', '').strip())
-                    except:
-                        continue
-                    ts = row.get('dateTime', '').strip()
-                    if not ts:
-                        continue
-
+                lines = (line.decode('utf-8', errors='ignore') for line in response.iter_lines() if line)
+                for ref, level, ts in parse_archive(lines, all_stations):
                     river, label = all_stations[ref]
                     insert_reading(cur, ref, river, label, level, ts)
                     daily += 1
@@ -121,4 +123,5 @@ def main():
     print("THE BEAST IS FED AND WHOLE.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profiled("backfill_levels_csv"):
+        main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+backtest.py – rolling-origin backtest of the live 24h forecast
+Replays the same recursive walk as level_predictor.py from many origins at once
+(one batched predict per step) and scores every step against what was measured.
+Stations run in parallel worker processes.
+
+    python /app/utility/backtest.py --days 90 --stride 6
+    python /app/utility/backtest.py --stations 760112 710151 --out /tmp/bt.csv
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, UTC
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import create_engine
+
+# Add /app to path for shared imports
+sys.path.append("/app")
+from river_reference import STATIONS
+from features import HORIZON, LAGS, load_hourly, build_features, recursive_forecast
+from compact_model import load_model
+
+warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
+
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+CONNECTION_STRING = f"postgresql://river_user:{DB_PASSWORD}@db/river_levels_db"
+MODEL_DIR = "/app/models"
+RESULTS_PATH = "/app/data/backtest_results.csv"
+
+def origin_errors(model, df, stride):
+    """(n_origins, HORIZON) array of forecast minus measured level."""
+    data = build_features(df)
+    X = data.drop(columns=['level'])
+    X = X.iloc[(len(X) - 1) % stride::stride]
+    if X.empty:
+        return np.empty((0, HORIZON))
+
+    future_start = X.index + pd.Timedelta(hours=1)
+    preds = recursive_forecast(model, X, future_start)
+
+    # Scored against the hours the live predictor publishes them for:
+    # step k (1-based) is origin + k h, the same future_times as level_predictor.py
+    steps = pd.to_timedelta(np.arange(1, HORIZON + 1), unit='h')
+    targets = (X.index.values[:, None] + steps.values[None, :]).ravel()
+    pos = df.index.get_indexer(targets)
+    actual = np.where(pos >= 0, df['level'].to_numpy()[pos], np.nan).reshape(preds.shape)
+    return preds - actual
+
+def backtest_station(sid, days, stride):
+    model = load_model(MODEL_DIR, sid)
+    if model is None:
+        return sid, None
+
+    engine = create_engine(CONNECTION_STRING)
+    since = datetime.now(UTC) - timedelta(days=days, hours=max(LAGS) + 6)
+    df = load_hourly(engine, sid, since)
+    engine.dispose()
+    if df.empty:
+        return sid, None
+
+    err = origin_errors(model, df, stride)
+    n = np.sum(~np.isnan(err), axis=0)
+    if not n.any():
+        return sid, None
+    with np.errstate(invalid='ignore'):
+        result = pd.DataFrame({
+            'station_id': sid,
+            'step': np.arange(1, HORIZON + 1),
+            'origins': n,
+            'mae': np.nanmean(np.abs(err), axis=0),
+            'rmse': np.sqrt(np.nanmean(err ** 2, axis=0)),
+        })
+    return sid, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the 24h level forecast")
+    parser.add_argument("--stations", nargs="*", help="station IDs (default: every station with a model)")
+    parser.add_argument("--days", type=int, default=90, help="history to replay")
+    parser.add_argument("--stride", type=int, default=1, help="hours between forecast origins")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    sids = args.stations or [s['id'] for stations in STATIONS.values() for s in stations]
+    logger.info(f"Backtesting {len(sids)} stations over {args.days} days (origin every {args.stride}h)")
+    t0 = time.perf_counter()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(backtest_station, sid, args.days, args.stride) for sid in sids]
+        for fut in as_completed(futures):
+            sid, result = fut.result()
+            if result is None:
+                logger.warning(f"No model or data for {sid} — skipped")
+                continue
+            logger.info(f"{sid}: MAE {result['mae'].iloc[0]:.3f}m (step 1) → {result['mae'].iloc[-1]:.3f}m (step {HORIZON})")
+            results.append(result)
+
+    if not results:
+        logger.error("Nothing to score")
+        return
+
+    table = pd.concat(results, ignore_index=True).sort_values(['station_id', 'step'])
+    table.round(5).to_csv(args.out, index=False)
+
+    summary = table.pivot(index='station_id', columns='step', values='mae')[[1, 6, 12, HORIZON]]
+    print(summary.round(3).to_string())
+    logger.success(f"Backtest finished in {time.perf_counter() - t0:.1f}s → {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import joblib
 import os
 from datetime import datetime, timedelta
 from river_reference import STATIONS
+from features import load_hourly, build_features
 
 # Connection
 DB_PASSWORD = os.getenv("DB_PASSWORD")
@@ -59,35 +60,14 @@ for river, stations in STATIONS.items():
         end = datetime.now()
         start = end - timedelta(days=15)
 
-        df = pd.read_sql(f"""
-            SELECT 
-                r.timestamp::timestamptz AT TIME ZONE 'UTC' as ts,
-                r.level,
-                COALESCE(rf.rainfall_mm, 0) as rain
-            FROM readings r
-            LEFT JOIN rainfall_readings rf 
-                ON rf.level_station_id = r.station_id 
-               AND rf.timestamp::timestamptz = r.timestamp::timestamptz
-            WHERE r.station_id = %s AND r.timestamp >= %s
-            ORDER BY r.timestamp
-        """, engine, params=(sid, start))
+        df = load_hourly(engine, sid, start)
 
         if df.empty:
             print("  No data in date range — skipping")
             continue
 
-        df['ts'] = pd.to_datetime(df['ts']).dt.tz_localize(None)
-        df = df.set_index('ts').resample('h').mean().ffill()
-
         # Features
-        data = df.copy()
-        for lag in [1, 3, 6, 12, 24]:
-            data[f'level_lag_{lag}'] = data['level'].shift(lag)
-            data[f'rain_lag_{lag}'] = data['rain'].shift(lag)
-        data['hour'] = data.index.hour
-        data['dayofweek'] = data.index.dayofweek
-        data['rolling_6h_mean'] = data['level'].rolling(6).mean()
-        data = data.dropna()
+        data = build_features(df)
 
         if len(data) < 100:
             print("  Not enough feature data — skipping")
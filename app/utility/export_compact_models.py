@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+export_compact_models.py – compile every {sid}_hgboost.pkl into {sid}_hgboost.npz
+Run after retraining; the predictor picks up the .npz automatically and
+falls back to the pickle whenever the export is missing or stale.
+Each export is checked against sklearn on random rows before it is kept.
+"""
+import glob
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Add /app to path for shared imports
+sys.path.append("/app")
+from compact_model import export
+
+MODEL_DIR = "/app/models"
+CHECK_ROWS = 2000
+TOLERANCE = 1e-9
+
+def random_rows(model, n):
+    """Rows spread across each feature's bin thresholds, with a few NaNs."""
+    rng = np.random.default_rng(0)
+    cols = []
+    for thresholds in model._bin_mapper.bin_thresholds_:
+        lo, hi = (thresholds.min(), thresholds.max()) if len(thresholds) else (0.0, 1.0)
+        pad = (hi - lo) * 0.1 + 1e-3
+        cols.append(rng.uniform(lo - pad, hi + pad, n))
+    X = np.column_stack(cols)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return pd.DataFrame(X, columns=model.feature_names_in_)
+
+if __name__ == "__main__":
+    model_dir = sys.argv[1] if len(sys.argv) > 1 else MODEL_DIR
+    for pkl_path in sorted(glob.glob(f"{model_dir}/*_hgboost.pkl")):
+        npz_path = pkl_path[:-len('.pkl')] + '.npz'
+        model = joblib.load(pkl_path)
+        compact = export(pkl_path, npz_path)
+
+        X = random_rows(model, CHECK_ROWS)
+        diff = np.abs(model.predict(X) - compact.predict(X)).max()
+        if diff > TOLERANCE:
+            os.remove(npz_path)
+            logger.error(f"{os.path.basename(pkl_path)}: export differs by {diff:.2e} — removed")
+            continue
+
+        row = X.iloc[:1]
+        t0 = time.perf_counter()
+        model.predict(row)
+        sk_ms = (time.perf_counter() - t0) * 1e3
+        t0 = time.perf_counter()
+        compact.predict(row)
+        np_ms = (time.perf_counter() - t0) * 1e3
+        logger.success(
+            f"{os.path.basename(npz_path)}: {os.path.getsize(npz_path) / 1e6:.1f} MB "
+            f"(pickle {os.path.getsize(pkl_path) / 1e6:.1f} MB), "
+            f"1-row predict {sk_ms:.1f}ms → {np_ms:.1f}ms, max diff {diff:.1e}"
+        )
@@ -2,32 +2,31 @@
 """
 get_readings.py - 15-min collection
 Now with permanent, error-free G SPOT detection
+G SPOT is streamed: per-station 2h level window + hourly rain buckets held in
+memory (persisted in gspot_state once per run), so ingestion adds no queries
+Rules come from rules.py, the same compiled rules update_gspot.py applies
 """
 
 import requests
 import psycopg2
+from psycopg2.extras import execute_values
+from bisect import bisect_left, insort
+from collections import deque
 from datetime import datetime, timedelta, UTC
 import time
 import json
-from pathlib import Path
+import pandas as pd
 from loguru import logger
-from river_reference import STATIONS
+from river_reference import STATIONS, EA_API_BASE
+from refresh import notify
+from rules import rule_for
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 DB_PASS = os.getenv("DB_PASSWORD")
 CONNECTION_STRING = f'postgresql://river_user:{DB_PASS}@db/river_levels_db'
-
-# === LOAD RULES ===
-RULES_PATH = Path("/app/data/rules.json")
-if not RULES_PATH.exists():
-    RULES_PATH = Path("/home/river_levels_app/rules.json")
-try:
-    RULES = json.loads(RULES_PATH.read_text())
-except Exception as e:
-    logger.error(f"Failed to load rules.json: {e}")
-    RULES = {}
+NEW_ROWS = 0  # rows this run actually added; dashboards are only told if > 0
 
 # === DATABASE ===
 def init_db():
@@ -55,6 +54,13 @@ def init_db():
             UNIQUE(level_station_id, timestamp)
         )
     ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gspot_state (
+            station_id TEXT PRIMARY KEY,
+            state JSONB NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    ''')
     conn.commit()
     conn.close()
 
@@ -72,7 +78,7 @@ def api_get(url, params=None):
 
 # === LEVELS ===
 def get_latest_river_level(station_id):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{station_id}/readings"
     data = api_get(url, params={"latest": "", "parameter": "level"})
     if data and 'items' in data and data['items']:
         item = data['items'][0]
@@ -80,28 +86,35 @@ def get_latest_river_level(station_id):
     return None, None
 
 def fetch_missing_readings(station_id, since_date):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{station_id}/readings"
     data = api_get(url, params={"parameter": "level", "since": since_date, "_sorted": ""})
     if data and 'items' in data:
         return [(item['value'], item['dateTime']) for item in data['items']]
     return []
 
 def insert_reading(station_id, river, label, level, timestamp):
+    global NEW_ROWS
+    stream = STREAMS.get(station_id)
+    ts = parse_ts(timestamp)
+    rule = rule_for(station_id)
+    flag = stream.flag_for(ts, level, rule) if stream and rule else 'n'
+
     conn = psycopg2.connect(CONNECTION_STRING)
     cursor = conn.cursor()
     try:
         cursor.execute('''
             INSERT INTO readings (station_id, river, label, level, timestamp, good_level)
-            VALUES (%s, %s, %s, %s, %s, 'n')
+            VALUES (%s, %s, %s, %s, %s, %s)
             ON CONFLICT (station_id, timestamp) DO NOTHING
-        ''', (station_id, river, label, level, timestamp))
+        ''', (station_id, river, label, level, timestamp, flag))
 
         if cursor.rowcount:
+            NEW_ROWS += 1
             logger.info(f"Inserted {level:.3f}m @ {label}")
-            try:
-                evaluate_g_spot(cursor, station_id, timestamp, level)
-            except Exception as e:
-                logger.error(f"G SPOT eval failed: {e}")
+            if stream:
+                stream.add_level(ts, level)
+            if flag == 'y':
+                logger.success(f"G SPOT → Y | {station_id} {level:.3f}m")
 
         conn.commit()
     except Exception as e:
@@ -110,54 +123,157 @@ def insert_reading(station_id, river, label, level, timestamp):
         cursor.close()
         conn.close()
 
-# === G SPOT EVALUATION ===
-def evaluate_g_spot(cursor, station_id: str, ts_iso: str, current_level: float):
-    cfg = RULES.get(station_id, {}).get("good_fishing")
-    if not cfg:
-        return
+# === G SPOT STREAM ===
+FALLING_WINDOW = timedelta(hours=2)
+RAIN_WINDOW = timedelta(days=14)
+
+def parse_ts(ts_iso):
+    return datetime.fromisoformat(str(ts_iso).replace("Z", "+00:00"))
+
+class GSpotStream:
+    """
+    Rolling G SPOT state for one station.
+    levels: readings in the trailing 2h (a handful of points, kept sorted)
+    rain:   hourly buckets over the widest rain window with running (prefix)
+            totals, so the sum over any rule's own window is the difference
+            of two prefix sums – O(log n) per reading
+    """
+    def __init__(self, levels=(), rain=(), window=FALLING_WINDOW, rain_window=RAIN_WINDOW):
+        self.window = window
+        self.rain_window = rain_window
+        self.levels = sorted(levels)
+        self.rain = deque()
+        self._cum = deque()   # running total up to and including each bucket
+        self._cum_base = 0.0  # running total before the oldest bucket
+        for hour, mm in rain:
+            self.rain.append((hour, mm))
+            self._cum.append((self._cum[-1] if self._cum else 0.0) + mm)
+
+    @property
+    def rain_total(self):
+        return self._cum[-1] - self._cum_base if self._cum else 0.0
+
+    def rain_since(self, cutoff):
+        """Rain in the buckets from `cutoff` on."""
+        i = bisect_left(self.rain, cutoff, key=lambda bucket: bucket[0])
+        if i == len(self.rain):
+            return 0.0
+        return self._cum[-1] - (self._cum[i - 1] if i else self._cum_base)
+
+    def _expire(self, now):
+        while self.levels and self.levels[0][0] < now - self.window:
+            self.levels.pop(0)
+        while self.rain and self.rain[0][0] < now - self.rain_window:
+            self.rain.popleft()
+            self._cum_base = self._cum.popleft()
+
+    def flag_for(self, ts, level, rule):
+        """Flag a new reading would get; only drops entries that have aged out."""
+        if self.levels and ts <= self.levels[-1][0]:
+            return 'n'  # late (backfilled) reading – left for update_gspot.py
+        self._expire(ts)
+        window_ts = pd.DatetimeIndex([t for t, _ in self.levels] + [ts])
+        window_levels = [l for _, l in self.levels] + [level]
+        # The buffer covers the widest window; each rule is tested on its own
+        rain_total = self.rain_since(ts - rule.rain_window.to_pytimedelta()) if rule.needs_rain else None
+        return 'y' if rule.evaluate(window_ts, window_levels, rain_total)[-1] else 'n'
+
+    def add_level(self, ts, level):
+        if self.levels and ts < self.levels[-1][0]:
+            if ts >= self.levels[-1][0] - self.window:
+                insort(self.levels, (ts, level))
+            return
+        self.levels.append((ts, level))
+        self._expire(ts)
+
+    def add_rain(self, ts, mm):
+        hour = ts.replace(minute=0, second=0, microsecond=0)
+        if self.rain and self.rain[-1][0] == hour:
+            self.rain[-1] = (hour, self.rain[-1][1] + mm)
+            self._cum[-1] += mm
+        elif not self.rain or hour > self.rain[-1][0]:
+            self.rain.append((hour, mm))
+            self._cum.append((self._cum[-1] if self._cum else self._cum_base) + mm)
+        # else older than the newest bucket – rare, and outside O(1)
+
+    def to_json(self):
+        return json.dumps({
+            "levels": [[t.isoformat(), l] for t, l in self.levels],
+            "rain": [[t.isoformat(), mm] for t, mm in self.rain],
+        })
 
-    start_lvl = cfg.get("falling_start", 999)
-    end_lvl   = cfg.get("falling_end",   0)
-    rain_thr  = cfg.get("rain_threshold", 0)
-
-    ts = datetime.fromisoformat(ts_iso.replace("Z", "+00:00"))
-    two_h_ago      = ts - timedelta(hours=2)
-    fourteen_d_ago = ts - timedelta(days=14)
-
-    # Falling?
-    cursor.execute("""
-        SELECT level FROM readings
-        WHERE station_id = %s AND timestamp >= %s AND timestamp <= %s
-        ORDER BY timestamp
-    """, (station_id, two_h_ago, ts_iso))
-    recent = [r[0] for r in cursor.fetchall()]
-    falling = len(recent) >= 4 and all(recent[i] >= recent[i+1] for i in range(len(recent)-1))
-
-    # In band?
-    in_band = end_lvl <= current_level <= start_lvl
-
-    # 14-day rain (TEXT column)
-    cursor.execute("""
-        SELECT COALESCE(SUM(rainfall_mm), 0)
-        FROM rainfall_readings
-        WHERE level_station_id = %s AND timestamp::timestamptz >= %s
-    """, (station_id, fourteen_d_ago))
-    rain_total = cursor.fetchone()[0] or 0
-    rain_ok = rain_total >= rain_thr
-
-    flag = 'y' if (falling and in_band and rain_ok) else 'n'
-
-    cursor.execute("""
-        UPDATE readings SET good_level = %s
-        WHERE station_id = %s AND timestamp = %s
-    """, (flag, station_id, ts_iso))
-
-    if cursor.rowcount:
-        logger.success(f"G SPOT → {flag.upper()} | {station_id} {current_level:.3f}m")
+    @classmethod
+    def from_json(cls, state, **windows):
+        return cls(
+            levels=[(parse_ts(t), l) for t, l in state.get("levels", [])],
+            rain=[(parse_ts(t), mm) for t, mm in state.get("rain", [])],
+            **windows,
+        )
+
+def stream_windows(station_id):
+    """Windows wide enough for the station's rule (defaults when it has none)."""
+    rule = rule_for(station_id)
+    if not rule:
+        return {}
+    return {
+        "window": max(FALLING_WINDOW, rule.window.to_pytimedelta()),
+        "rain_window": max(RAIN_WINDOW, rule.lead_in().to_pytimedelta()),
+    }
+
+STREAMS = {}
+
+def load_streams(station_ids):
+    """One query for saved state; stations seen for the first time are seeded from history."""
+    conn = psycopg2.connect(CONNECTION_STRING)
+    cursor = conn.cursor()
+    cursor.execute("SELECT station_id, state FROM gspot_state WHERE station_id = ANY(%s)", (station_ids,))
+    streams = {sid: GSpotStream.from_json(state, **stream_windows(sid)) for sid, state in cursor.fetchall()}
+
+    new_ids = [sid for sid in station_ids if sid not in streams]
+    if new_ids:
+        logger.info(f"Seeding G SPOT state for {len(new_ids)} stations")
+        levels, rain = {}, {}
+        # As far back as the widest window any of these stations' rules looks
+        windows = [stream_windows(sid) for sid in new_ids]
+        level_secs = max([w["window"] for w in windows if w] + [FALLING_WINDOW]).total_seconds()
+        rain_secs = max([w["rain_window"] for w in windows if w] + [RAIN_WINDOW]).total_seconds()
+        cursor.execute("""
+            SELECT station_id, timestamp::timestamptz, level FROM readings
+            WHERE station_id = ANY(%s) AND level IS NOT NULL
+              AND timestamp::timestamptz >= NOW() - make_interval(secs => %s)
+        """, (new_ids, level_secs))
+        for sid, ts, level in cursor.fetchall():
+            levels.setdefault(sid, []).append((ts, level))
+        cursor.execute("""
+            SELECT level_station_id, date_trunc('hour', timestamp::timestamptz) AS hour, SUM(rainfall_mm)
+            FROM rainfall_readings
+            WHERE level_station_id = ANY(%s) AND timestamp::timestamptz >= NOW() - make_interval(secs => %s)
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """, (new_ids, rain_secs))
+        for sid, hour, mm in cursor.fetchall():
+            rain.setdefault(sid, []).append((hour, mm or 0))
+        for sid in new_ids:
+            streams[sid] = GSpotStream(levels.get(sid, []), rain.get(sid, []), **stream_windows(sid))
+
+    conn.close()
+    return streams
+
+def save_streams(streams):
+    if not streams:
+        return
+    conn = psycopg2.connect(CONNECTION_STRING)
+    cursor = conn.cursor()
+    execute_values(cursor, """
+        INSERT INTO gspot_state (station_id, state, updated_at) VALUES %s
+        ON CONFLICT (station_id) DO UPDATE SET state = EXCLUDED.state, updated_at = NOW()
+    """, [(sid, stream.to_json()) for sid, stream in streams.items()],
+        template="(%s, %s::jsonb, NOW())", page_size=len(streams))
+    conn.commit()
+    conn.close()
 
 # === RAINFALL ===
 def get_latest_rainfall(rainfall_id):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{rainfall_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{rainfall_id}/readings"
     data = api_get(url, params={"latest": "", "parameter": "rainfall"})
     if data and 'items' in data and data['items']:
         item = data['items'][0]
@@ -165,13 +281,14 @@ def get_latest_rainfall(rainfall_id):
     return None, None
 
 def fetch_missing_rainfall(rainfall_id, since_date):
-    url = f"https://environment.data.gov.uk/flood-monitoring/id/stations/{rainfall_id}/readings"
+    url = f"{EA_API_BASE}/id/stations/{rainfall_id}/readings"
     data = api_get(url, params={"parameter": "rainfall", "since": since_date, "_sorted": ""})
     if data and 'items' in data:
         return [(item['value'], item['dateTime']) for item in data['items']]
     return []
 
 def insert_rainfall(level_station_id, rainfall_station_id, rainfall_mm, timestamp):
+    global NEW_ROWS
     conn = psycopg2.connect(CONNECTION_STRING)
     cursor = conn.cursor()
     try:
@@ -182,7 +299,10 @@ def insert_rainfall(level_station_id, rainfall_station_id, rainfall_mm, timestam
             ON CONFLICT (level_station_id, timestamp) DO NOTHING
         ''', (level_station_id, rainfall_station_id, rainfall_mm, timestamp))
         if cursor.rowcount:
+            NEW_ROWS += 1
             logger.info(f"Inserted {rainfall_mm}mm rain for {level_station_id}")
+            if level_station_id in STREAMS and rainfall_mm is not None:
+                STREAMS[level_station_id].add_rain(parse_ts(timestamp), rainfall_mm)
         conn.commit()
     except Exception as e:
         logger.error(f"Rain insert error: {e}")
@@ -205,6 +325,7 @@ def has_gaps(station_id, days=7):
 if __name__ == "__main__":
     init_db()
     logger.info("Starting 15-min collection")
+    STREAMS.update(load_streams([s['id'] for stations in STATIONS.values() for s in stations]))
 
     for river, stations in STATIONS.items():
         for station in stations:
@@ -235,4 +356,7 @@ if __name__ == "__main__":
 
             time.sleep(1)
 
-    logger.info("Collection complete — G SPOTs updated")
\ No newline at end of file
+    save_streams(STREAMS)
+    logger.info("Collection complete — G SPOTs updated")
+    if NEW_ROWS:
+        notify(CONNECTION_STRING, "readings")
\ No newline at end of file
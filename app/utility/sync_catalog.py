@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+sync_catalog.py – onboard rivers and assign rain gauges from the EA station catalogs
+Replaces add_river_app.py. The full level and rainfall catalogs are pulled in
+one request each and cached under /app/data/catalog, so re-runs are offline
+unless --refresh is given. Rain gauges go into a KD-tree on unit-sphere
+coordinates (chord distance orders the same as great-circle distance), and
+every level station gets its nearest N gauges in one vectorized query.
+
+Writes stations.csv (new stations, missing coordinates, empty rainfall_id →
+nearest gauge) and rain_gauges.csv (station_id, gauge_id, rank, distance_km),
+both atomically.
+
+    python /app/utility/sync_catalog.py --refresh                       # refresh catalogs, fill gaps
+    python /app/utility/sync_catalog.py --river "River Wenning" --name Wenning
+    python /app/utility/sync_catalog.py --reassign --gauges 4           # nearest gauge for every station
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import requests
+from loguru import logger
+from scipy.spatial import cKDTree
+
+# Add /app to path for shared imports
+sys.path.append("/app")
+from river_reference import CSV_PATH, DATA_DIR, EA_API_BASE
+
+CATALOG_DIR = DATA_DIR / "catalog"
+GAUGES_PATH = DATA_DIR / "rain_gauges.csv"
+EA_STATIONS = f"{EA_API_BASE}/id/stations"
+EARTH_RADIUS_KM = 6371.0
+CSV_FIELDS = ["river", "station_id", "label", "lat", "lon", "rainfall_id"]
+
+def write_atomic(path, write):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        write(f)
+    os.replace(tmp, path)
+
+def _first(value):
+    # A few catalog entries carry a list of coordinates / names
+    return value[0] if isinstance(value, list) else value
+
+def fetch_catalog(parameter, refresh=False):
+    """EA stations measuring `parameter` as a DataFrame (id, label, river, lat, lon)."""
+    path = CATALOG_DIR / f"{parameter}_stations.json"
+    if refresh or not path.exists():
+        logger.info(f"Downloading {parameter} station catalog")
+        resp = requests.get(EA_STATIONS, params={"parameter": parameter, "_limit": 20000}, timeout=120)
+        resp.raise_for_status()
+        items = [{"id": i.get("notation"), "label": _first(i.get("label")), "river": _first(i.get("riverName")),
+                  "lat": _first(i.get("lat")), "lon": _first(i.get("long"))}
+                 for i in resp.json()["items"]]
+        CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, lambda f: json.dump(items, f))
+    df = pd.DataFrame(json.loads(path.read_text()))
+    return df.dropna(subset=["id", "lat", "lon"]).reset_index(drop=True)
+
+def unit_xyz(lat, lon):
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+class GaugeIndex:
+    def __init__(self, gauges):
+        self.ids = gauges["id"].to_numpy()
+        self.tree = cKDTree(unit_xyz(gauges["lat"], gauges["lon"]))
+
+    def nearest(self, lat, lon, n):
+        """(gauge ids, distances in km), each shaped (len(lat), n), nearest first."""
+        chord, idx = self.tree.query(unit_xyz(lat, lon), k=n)
+        chord, idx = chord.reshape(len(idx), -1), idx.reshape(len(idx), -1)
+        return self.ids[idx], 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync stations.csv and rain gauge assignments with the EA catalog")
+    parser.add_argument("--refresh", action="store_true", help="re-download the EA catalogs")
+    parser.add_argument("--river", action="append", default=[], help="EA riverName to onboard (repeatable)")
+    parser.add_argument("--name", help="river name to use in stations.csv (default: riverName without 'River ')")
+    parser.add_argument("--gauges", type=int, default=3, help="nearest rain gauges kept per station")
+    parser.add_argument("--reassign", action="store_true", help="replace existing rainfall_id values with the nearest gauge")
+    args = parser.parse_args()
+
+    levels = fetch_catalog("level", args.refresh)
+    gauges = fetch_catalog("rainfall", args.refresh)
+    logger.info(f"Catalog: {len(levels)} level stations, {len(gauges)} rain gauges")
+
+    with open(CSV_PATH, newline="") as f:
+        rows = list(csv.DictReader(f))
+    known = {r["station_id"] for r in rows}
+
+    # Onboard whole rivers in one pass over the catalog
+    for river in args.river:
+        name = args.name or river.removeprefix("River ")
+        new = levels[(levels["river"] == river) & ~levels["id"].isin(known)]
+        if new.empty:
+            logger.warning(f"No new level stations on {river}")
+        for s in new.itertuples():
+            rows.append({"river": name, "station_id": s.id, "label": s.label, "lat": s.lat, "lon": s.lon, "rainfall_id": ""})
+            known.add(s.id)
+        logger.success(f"Added {len(new)} stations on {river} as {name}")
+
+    # Missing coordinates from the catalog instead of one API call per station
+    coords = levels.set_index("id")[["lat", "lon"]]
+    for r in rows:
+        if not (r["lat"] and r["lon"]) and r["station_id"] in coords.index:
+            r["lat"], r["lon"] = coords.loc[r["station_id"]].tolist()
+    located = []
+    for r in rows:
+        if r["lat"] and r["lon"]:
+            located.append(r)
+        else:
+            logger.warning(f"No coordinates for {r['station_id']} — skipping gauge assignment")
+
+    # Nearest gauges for every station in one KD-tree query
+    ids, km = GaugeIndex(gauges).nearest([float(r["lat"]) for r in located], [float(r["lon"]) for r in located], args.gauges)
+    assignments = []
+    for r, gauge_ids, dists in zip(located, ids, km):
+        if args.reassign or not r.get("rainfall_id"):
+            r["rainfall_id"] = gauge_ids[0]
+        assignments += [(r["station_id"], g, rank + 1, round(float(d), 2)) for rank, (g, d) in enumerate(zip(gauge_ids, dists))]
+
+    def write_stations(f):
+        writer = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    def write_gauges(f):
+        writer = csv.writer(f)
+        writer.writerow(["station_id", "gauge_id", "rank", "distance_km"])
+        writer.writerows(assignments)
+
+    write_atomic(CSV_PATH, write_stations)
+    write_atomic(GAUGES_PATH, write_gauges)
+    print(f"\n{len(rows)} stations in {CSV_PATH}, {len(assignments)} gauge assignments in {GAUGES_PATH}")
+
+if __name__ == "__main__":
+    main()